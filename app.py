@@ -1,11 +1,17 @@
-from flask import Flask, render_template, request, jsonify, abort
+from flask import Flask, Response, render_template, request, jsonify, abort, g
 import sqlite3
 import os
 import json
-from datetime import datetime
+import base64
+from datetime import date, datetime, timedelta, timezone
 from apscheduler.schedulers.background import BackgroundScheduler
 import arxiv_retrieval
 import paper_processor
+import config
+import db
+import search
+import related_papers
+from response_cache import ResponseCache
 import logging
 
 # Set up logging
@@ -25,11 +31,35 @@ DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quantum_pape
 # Initialize Flask app
 app = Flask(__name__)
 
-# Helper function to connect to the database
+# Helper function to connect to the database: each request borrows one
+# read-only connection from the shared pool and returns it on teardown
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    return conn
+    if 'db_conn' not in g:
+        g.db_conn = db.acquire(DB_PATH, read_only=True)
+        g.db_conn.row_factory = sqlite3.Row  # This enables column access by name
+    return g.db_conn
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db.release(conn)
+
+# Helper function to read the data version bumped by every write the pages show
+def load_data_version():
+    with db.connection(DB_PATH, read_only=True) as conn:
+        version, updated_at = conn.execute(
+            'SELECT version, updated_at FROM data_version WHERE id = 1').fetchone()
+    last_modified = datetime.fromisoformat(updated_at).replace(tzinfo=timezone.utc)
+    return version, last_modified
+
+# Rendered pages, reused until the worker changes the data behind them
+response_cache = ResponseCache(
+    load_data_version,
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=config.RESPONSE_CACHE_MAX_BYTES,
+    poll_interval=config.DATA_VERSION_POLL_SECONDS
+)
 
 # Helper function to format date
 def format_date(date_str):
@@ -42,17 +72,16 @@ def format_date(date_str):
 # # Schedule background tasks
 # def schedule_tasks():
 #     scheduler = BackgroundScheduler()
-    
+
 #     # Schedule paper retrieval to run daily
 #     scheduler.add_job(
-#         func=arxiv_retrieval.retrieve_recent_papers,
+#         func=arxiv_retrieval.retrieve_new_papers,
 #         trigger='interval',
 #         days=1,
 #         id='retrieve_papers',
-#         kwargs={'max_results': 20},
 #         replace_existing=True
 #     )
-    
+
 #     # Schedule paper processing to run 30 minutes after retrieval
 #     scheduler.add_job(
 #         func=paper_processor.process_unprocessed_papers,
@@ -61,200 +90,592 @@ def format_date(date_str):
 #         id='process_papers',
 #         replace_existing=True
 #     )
-    
+
 #     scheduler.start()
 #     logger.info("Scheduled tasks have been set up")
 
+# Helper function to decode the JSON lists stored in paper_listings
+def listing_names(value):
+    return json.loads(value) if value else []
+
+# Columns of paper_listings shown on listing pages
+LISTING_COLUMNS = 'paper_id, arxiv_id, title, published_date, entry_url, pdf_url, authors, categories, brief_summary'
+
+def encode_cursor(published_date, paper_id):
+    """
+    Encode a listing position as an opaque, URL-safe cursor.
+    
+    Args:
+        published_date (str): Published date of the paper at the position
+        paper_id (int): ID of the paper at the position
+    
+    Returns:
+        str: The cursor
+    """
+    token = json.dumps([published_date, paper_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor.
+    
+    Args:
+        cursor (str): The cursor
+    
+    Returns:
+        tuple: (published_date, paper_id), or None if the cursor is malformed
+    """
+    try:
+        token = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        published_date, paper_id = json.loads(token)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(published_date, str) or not isinstance(paper_id, int):
+        return None
+    return published_date, paper_id
+
+# Fields the paper API can return and the column each is read from
+PAPER_FIELDS = {
+    'id': 'l.paper_id',
+    'arxiv_id': 'l.arxiv_id',
+    'title': 'l.title',
+    'authors': 'l.authors',
+    'published_date': 'l.published_date',
+    'entry_url': 'l.entry_url',
+    'pdf_url': 'l.pdf_url',
+    'categories': 'l.categories',
+    'brief_summary': 'l.brief_summary',
+    'abstract': 'a.abstract_text',
+    'extended_summary': 's.extended_summary',
+    'full_text': 'decode_full_text(f.full_text, f.encoding, f.blob_segment, f.blob_offset, f.blob_length)'
+}
+
+# Joins needed by the fields stored outside paper_listings
+FIELD_JOINS = {
+    'abstract': 'LEFT JOIN abstracts a ON a.paper_id = l.paper_id',
+    'extended_summary': 'LEFT JOIN summaries s ON s.paper_id = l.paper_id',
+    'full_text': 'LEFT JOIN full_texts f ON f.paper_id = l.paper_id'
+}
+
+# Fields returned when a request does not choose its own
+DEFAULT_FIELDS = ['id', 'arxiv_id', 'title', 'authors', 'published_date',
+                  'entry_url', 'pdf_url', 'categories', 'brief_summary']
+
+def listing_select(fields=None):
+    """
+    Build the select list and joins that read the given fields.
+    
+    The paper ID and published date are always selected, since cursors are
+    made from them.
+    
+    Args:
+        fields (list): Names from PAPER_FIELDS, or None for LISTING_COLUMNS
+    
+    Returns:
+        tuple: (select list, joins)
+    """
+    if fields is None:
+        return ', '.join(f'l.{column}' for column in LISTING_COLUMNS.split(', ')), ''
+    columns = ['l.paper_id', 'l.published_date']
+    columns += [f'{PAPER_FIELDS[field]} AS {field}' for field in fields if field not in ('id', 'published_date')]
+    joins = [FIELD_JOINS[field] for field in fields if field in FIELD_JOINS]
+    return ', '.join(columns), ' '.join(joins)
+
+def listing_conditions(filters=None):
+    """
+    Build the WHERE conditions of a listing filter.
+    
+    Args:
+        filters (dict): Optional 'since' and 'until' published date bounds
+            (ISO strings; until is exclusive) and a 'category' code
+    
+    Returns:
+        tuple: (list of conditions, list of parameters)
+    """
+    conditions, params = [], []
+    filters = filters or {}
+    if filters.get('since'):
+        conditions.append('l.published_date >= ?')
+        params.append(filters['since'])
+    if filters.get('until'):
+        conditions.append('l.published_date < ?')
+        params.append(filters['until'])
+    if filters.get('category'):
+        conditions.append('''EXISTS (
+            SELECT 1 FROM paper_categories pc
+            WHERE pc.paper_id = l.paper_id
+              AND pc.category_id = (SELECT id FROM categories WHERE category_code = ?))''')
+        params.append(filters['category'])
+    return conditions, params
+
+def fetch_listing_page(conn, limit, after=None, before=None, filters=None, fields=None):
+    """
+    Get one page of paper listings, newest first, by keyset pagination.
+    
+    Pages are located by comparing (published_date, paper_id) with the
+    cursor position, so each page is a range scan of the listing index
+    and costs the same however deep it is.
+    
+    Args:
+        conn: Database connection
+        limit (int): Papers per page
+        after (tuple): Return the papers older than this (published_date, paper_id)
+        before (tuple): Return the papers newer than this (published_date, paper_id)
+        filters (dict): Published date and category filter (see listing_conditions)
+        fields (list): Fields to read (see listing_select); None reads LISTING_COLUMNS
+    
+    Returns:
+        tuple: (rows, has_newer, has_older)
+    """
+    columns, joins = listing_select(fields)
+    conditions, params = listing_conditions(filters)
+    
+    if before is not None:
+        # Walk towards newer papers, then put the page back in display order
+        where = ' AND '.join(conditions + ['(l.published_date, l.paper_id) > (?, ?)'])
+        rows = conn.execute(f'''
+        SELECT {columns}
+        FROM paper_listings l {joins}
+        WHERE {where}
+        ORDER BY l.published_date ASC, l.paper_id ASC
+        LIMIT ?
+        ''', (*params, *before, limit + 1)).fetchall()
+        if len(rows) <= limit:
+            # Fewer than a page of newer papers left: show the first page instead
+            return fetch_listing_page(conn, limit, filters=filters, fields=fields)
+        return rows[:limit][::-1], True, True
+    
+    if after is not None:
+        conditions.append('(l.published_date, l.paper_id) < (?, ?)')
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    rows = conn.execute(f'''
+    SELECT {columns}
+    FROM paper_listings l {joins}
+    {where}
+    ORDER BY l.published_date DESC, l.paper_id DESC
+    LIMIT ?
+    ''', (*params, limit + 1)).fetchall()
+    return rows[:limit], after is not None, len(rows) > limit
+
+def iter_listings(conn, after=None, filters=None, fields=None, batch_size=500):
+    """
+    Iterate over every matching paper listing, newest first.
+    
+    Rows are read in keyset batches, so memory use does not grow with the
+    number of papers.
+    
+    Args:
+        conn: Database connection
+        after (tuple): Start after this (published_date, paper_id)
+        filters (dict): Published date and category filter (see listing_conditions)
+        fields (list): Fields to read (see listing_select)
+        batch_size (int): Rows read per query
+    
+    Yields:
+        sqlite3.Row: Listing rows
+    """
+    while True:
+        rows, _, has_older = fetch_listing_page(conn, batch_size, after=after, filters=filters, fields=fields)
+        yield from rows
+        if not has_older:
+            return
+        after = (rows[-1]['published_date'], rows[-1]['paper_id'])
+
+def get_total_papers(conn):
+    """
+    Get the number of papers from the counters kept by the stats triggers.
+    
+    Args:
+        conn: Database connection
+    
+    Returns:
+        int: Number of papers
+    """
+    row = conn.execute("SELECT value FROM counters WHERE name = 'papers'").fetchone()
+    return row[0] if row else 0
+
+def page_cursors(rows, has_newer, has_older):
+    """
+    Get the cursors of the pages either side of a page of listings.
+    
+    Args:
+        rows (list): The page's rows, newest first
+        has_newer (bool): Whether newer papers exist
+        has_older (bool): Whether older papers exist
+    
+    Returns:
+        tuple: (prev_cursor, next_cursor), None where there is no such page
+    """
+    prev_cursor = next_cursor = None
+    if rows and has_newer:
+        prev_cursor = encode_cursor(rows[0]['published_date'], rows[0]['paper_id'])
+    if rows and has_older:
+        next_cursor = encode_cursor(rows[-1]['published_date'], rows[-1]['paper_id'])
+    return prev_cursor, next_cursor
+
+def listing_to_dict(row):
+    return {
+        'id': row['paper_id'],
+        'arxiv_id': row['arxiv_id'],
+        'title': row['title'],
+        'authors': listing_names(row['authors']),
+        'published_date': row['published_date'],
+        'entry_url': row['entry_url'],
+        'pdf_url': row['pdf_url'],
+        'categories': listing_names(row['categories']),
+        'brief_summary': row['brief_summary']
+    }
+
+def parse_cursor_args():
+    """
+    Read the after/before cursors from the request's query string.
+    
+    Returns:
+        tuple: (after, before) positions, each None if not given
+    
+    Raises:
+        ValueError: If a cursor is malformed
+    """
+    after = before = None
+    if request.args.get('after'):
+        after = decode_cursor(request.args['after'])
+        if after is None:
+            raise ValueError('Invalid cursor')
+    elif request.args.get('before'):
+        before = decode_cursor(request.args['before'])
+        if before is None:
+            raise ValueError('Invalid cursor')
+    return after, before
+
+def parse_listing_args():
+    """
+    Read the published date and category filter and the field list from the
+    request's query string.
+    
+    Dates are YYYY-MM-DD; both ends of the since/until range are inclusive.
+    
+    Returns:
+        tuple: (filters, fields)
+    
+    Raises:
+        ValueError: If a date or field name is invalid
+    """
+    filters = {'category': request.args.get('category')}
+    try:
+        if request.args.get('since'):
+            filters['since'] = date.fromisoformat(request.args['since']).isoformat()
+        if request.args.get('until'):
+            filters['until'] = (date.fromisoformat(request.args['until']) + timedelta(days=1)).isoformat()
+    except ValueError:
+        raise ValueError('Invalid date; use YYYY-MM-DD')
+    
+    fields = DEFAULT_FIELDS
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in PAPER_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}; choose from {', '.join(PAPER_FIELDS)}")
+        fields = list(dict.fromkeys(fields))
+    return filters, fields
+
+def paper_to_dict(row, fields):
+    """
+    Shape a row read with listing_select for the JSON API.
+    
+    Args:
+        row (sqlite3.Row): The row
+        fields (list): Fields to include, in order
+    
+    Returns:
+        dict: The paper
+    """
+    paper = {}
+    for field in fields:
+        if field == 'id':
+            paper[field] = row['paper_id']
+        elif field in ('authors', 'categories'):
+            paper[field] = listing_names(row[field])
+        else:
+            paper[field] = row[field]
+    return paper
+
 # Routes
 @app.route('/')
+@response_cache.cached
 def index():
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    offset = (page - 1) * per_page
+    per_page = config.PAPERS_PER_PAGE
+    try:
+        after, before = parse_cursor_args()
+    except ValueError:
+        abort(400)
     
     conn = get_db_connection()
     
-    # Get total number of papers
-    total_papers = conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
-    
-    # Get papers for current page
-    papers_query = '''
-    SELECT p.id, p.arxiv_id, p.title, p.published_date, p.entry_url, p.pdf_url, s.brief_summary
-    FROM papers p
-    LEFT JOIN summaries s ON p.id = s.paper_id
-    ORDER BY p.published_date DESC
-    LIMIT ? OFFSET ?
-    '''
-    papers_data = conn.execute(papers_query, (per_page, offset)).fetchall()
+    # Get papers for current page, authors and categories included
+    papers_data, has_prev, has_next = fetch_listing_page(conn, per_page, after=after, before=before)
+    total_papers = get_total_papers(conn)
     
     papers = []
     for paper in papers_data:
-        # Get authors for this paper
-        authors_query = '''
-        SELECT a.name
-        FROM authors a
-        JOIN paper_authors pa ON a.id = pa.author_id
-        WHERE pa.paper_id = ?
-        ORDER BY pa.author_position
-        '''
-        authors = [row[0] for row in conn.execute(authors_query, (paper['id'],)).fetchall()]
-        
-        # Get categories for this paper
-        categories_query = '''
-        SELECT c.category_code
-        FROM categories c
-        JOIN paper_categories pc ON c.id = pc.category_id
-        WHERE pc.paper_id = ?
-        '''
-        categories = [row[0] for row in conn.execute(categories_query, (paper['id'],)).fetchall()]
-        
-        papers.append({
-            'id': paper['id'],
-            'arxiv_id': paper['arxiv_id'],
-            'title': paper['title'],
-            'authors': authors,
-            'published_date': format_date(paper['published_date']),
-            'entry_url': paper['entry_url'],
-            'pdf_url': paper['pdf_url'],
-            'categories': categories,
-            'brief_summary': paper['brief_summary'] if paper['brief_summary'] else "Summary not available yet."
-        })
+        paper_dict = listing_to_dict(paper)
+        paper_dict['published_date'] = format_date(paper['published_date'])
+        if not paper_dict['brief_summary']:
+            paper_dict['brief_summary'] = "Summary not available yet."
+        papers.append(paper_dict)
     
     # Calculate pagination info
-    total_pages = (total_papers + per_page - 1) // per_page
-    has_prev = page > 1
-    has_next = page < total_pages
-    
-    conn.close()
+    prev_cursor, next_cursor = page_cursors(papers_data, has_prev, has_next)
     
     return render_template(
         'index.html',
         papers=papers,
-        page=page,
-        total_pages=total_pages,
+        total_papers=total_papers,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
         has_prev=has_prev,
         has_next=has_next
     )
 
+@app.route('/api/papers')
+def api_papers():
+    try:
+        after, before = parse_cursor_args()
+        filters, fields = parse_listing_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if request.args.get('format') == 'ndjson':
+        # Exports run forwards from a cursor, towards older papers
+        if before is not None:
+            return jsonify({'error': 'before is not supported with format=ndjson; use after'}), 400
+        limit = request.args.get('limit', type=int)
+        if 'limit' in request.args and (limit is None or limit < 1):
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        return stream_papers(after, filters, fields, limit)
+    
+    limit = request.args.get('limit', config.PAPERS_PER_PAGE, type=int)
+    limit = max(1, min(limit, config.API_MAX_PAGE_SIZE))
+    
+    conn = get_db_connection()
+    
+    papers_data, has_newer, has_older = fetch_listing_page(
+        conn, limit, after=after, before=before, filters=filters, fields=fields)
+    total_papers = get_total_papers(conn)
+    
+    prev_cursor, next_cursor = page_cursors(papers_data, has_newer, has_older)
+    
+    return jsonify({
+        'papers': [paper_to_dict(paper, fields) for paper in papers_data],
+        'total_papers': total_papers,
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor
+    })
+
+def stream_papers(after, filters, fields, limit=None):
+    """
+    Stream matching papers as newline-delimited JSON, one paper per line.
+    
+    Every paper after the cursor is exported unless limit is given. When
+    the limit cuts the export short, a last line holds the next_cursor to
+    resume from.
+    
+    Args:
+        after (tuple): Start after this (published_date, paper_id)
+        filters (dict): Published date and category filter
+        fields (list): Fields to include
+        limit (int): Most papers exported, at least 1 (None exports all)
+    
+    Returns:
+        Response: The streaming response
+    """
+    # The body is generated after the request's own connection is released,
+    # so the export borrows a connection of its own
+    def generate():
+        with db.connection(DB_PATH, read_only=True) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = iter_listings(conn, after=after, filters=filters, fields=fields,
+                                 batch_size=config.API_EXPORT_BATCH_SIZE)
+            count = 0
+            last = None
+            for row in rows:
+                if limit is not None and count >= limit:
+                    yield json.dumps({'next_cursor': encode_cursor(last['published_date'], last['paper_id'])}) + '\n'
+                    return
+                yield json.dumps(paper_to_dict(row, fields)) + '\n'
+                count += 1
+                last = row
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+# Query for a single paper's details, authors and categories included
+PAPER_DETAIL_QUERY = '''
+SELECT l.paper_id, l.arxiv_id, l.title, l.published_date, l.entry_url, l.pdf_url,
+       l.authors, l.categories, a.abstract_text, s.extended_summary
+FROM paper_listings l
+LEFT JOIN abstracts a ON l.paper_id = a.paper_id
+LEFT JOIN summaries s ON l.paper_id = s.paper_id
+WHERE l.paper_id = ?
+'''
+
 @app.route('/paper/<int:paper_id>')
+@response_cache.cached
 def paper_detail(paper_id):
     conn = get_db_connection()
     
     # Get paper details
-    paper_query = '''
-    SELECT p.id, p.arxiv_id, p.title, p.published_date, p.entry_url, p.pdf_url, 
-           a.abstract_text, s.extended_summary
-    FROM papers p
-    LEFT JOIN abstracts a ON p.id = a.paper_id
-    LEFT JOIN summaries s ON p.id = s.paper_id
-    WHERE p.id = ?
-    '''
-    paper_data = conn.execute(paper_query, (paper_id,)).fetchone()
+    paper_data = conn.execute(PAPER_DETAIL_QUERY, (paper_id,)).fetchone()
     
     if paper_data is None:
-        conn.close()
         abort(404)
     
-    # Get authors for this paper
-    authors_query = '''
-    SELECT a.name
-    FROM authors a
-    JOIN paper_authors pa ON a.id = pa.author_id
-    WHERE pa.paper_id = ?
-    ORDER BY pa.author_position
-    '''
-    authors = [row[0] for row in conn.execute(authors_query, (paper_id,)).fetchall()]
-    
-    # Get categories for this paper
-    categories_query = '''
-    SELECT c.category_code
-    FROM categories c
-    JOIN paper_categories pc ON c.id = pc.category_id
-    WHERE pc.paper_id = ?
-    '''
-    categories = [row[0] for row in conn.execute(categories_query, (paper_id,)).fetchall()]
-    
     paper = {
-        'id': paper_data['id'],
+        'id': paper_data['paper_id'],
         'arxiv_id': paper_data['arxiv_id'],
         'title': paper_data['title'],
-        'authors': authors,
+        'authors': listing_names(paper_data['authors']),
         'published_date': format_date(paper_data['published_date']),
         'entry_url': paper_data['entry_url'],
         'pdf_url': paper_data['pdf_url'],
-        'categories': categories,
+        'categories': listing_names(paper_data['categories']),
         'abstract': paper_data['abstract_text'],
         'extended_summary': paper_data['extended_summary'] if paper_data['extended_summary'] else "Extended summary not available yet."
     }
     
-    conn.close()
+    # Get related papers
+    related = []
+    for row in related_papers.get_related_papers(conn, paper_id):
+        related_paper = related_to_dict(row)
+        related_paper['published_date'] = format_date(related_paper['published_date'])
+        related.append(related_paper)
     
-    return render_template('paper_detail.html', paper=paper)
+    return render_template('paper_detail.html', paper=paper, related=related)
 
 @app.route('/api/paper/<int:paper_id>')
+@response_cache.cached
 def api_paper_detail(paper_id):
     conn = get_db_connection()
     
     # Get paper details
-    paper_query = '''
-    SELECT p.id, p.arxiv_id, p.title, p.published_date, p.entry_url, p.pdf_url, 
-           a.abstract_text, s.extended_summary
-    FROM papers p
-    LEFT JOIN abstracts a ON p.id = a.paper_id
-    LEFT JOIN summaries s ON p.id = s.paper_id
-    WHERE p.id = ?
-    '''
-    paper_data = conn.execute(paper_query, (paper_id,)).fetchone()
+    paper_data = conn.execute(PAPER_DETAIL_QUERY, (paper_id,)).fetchone()
     
     if paper_data is None:
-        conn.close()
         return jsonify({'error': 'Paper not found'}), 404
     
-    # Get authors for this paper
-    authors_query = '''
-    SELECT a.name
-    FROM authors a
-    JOIN paper_authors pa ON a.id = pa.author_id
-    WHERE pa.paper_id = ?
-    ORDER BY pa.author_position
-    '''
-    authors = [row[0] for row in conn.execute(authors_query, (paper_id,)).fetchall()]
-    
-    # Get categories for this paper
-    categories_query = '''
-    SELECT c.category_code
-    FROM categories c
-    JOIN paper_categories pc ON c.id = pc.category_id
-    WHERE pc.paper_id = ?
-    '''
-    categories = [row[0] for row in conn.execute(categories_query, (paper_id,)).fetchall()]
-    
     paper = {
-        'id': paper_data['id'],
+        'id': paper_data['paper_id'],
         'arxiv_id': paper_data['arxiv_id'],
         'title': paper_data['title'],
-        'authors': authors,
+        'authors': listing_names(paper_data['authors']),
         'published_date': paper_data['published_date'],
         'entry_url': paper_data['entry_url'],
         'pdf_url': paper_data['pdf_url'],
-        'categories': categories,
+        'categories': listing_names(paper_data['categories']),
         'abstract': paper_data['abstract_text'],
         'extended_summary': paper_data['extended_summary']
     }
     
-    conn.close()
-    
     return jsonify(paper)
 
+# Helper function to shape a related paper for the page or the API
+def related_to_dict(row):
+    return {
+        'id': row['paper_id'],
+        'arxiv_id': row['arxiv_id'],
+        'title': row['title'],
+        'authors': listing_names(row['authors']),
+        'published_date': row['published_date'],
+        'categories': listing_names(row['categories']),
+        'score': row['score']
+    }
+
+@app.route('/api/paper/<int:paper_id>/related')
+@response_cache.cached
+def api_related_papers(paper_id):
+    conn = get_db_connection()
+    
+    if conn.execute('SELECT 1 FROM paper_listings WHERE paper_id = ?', (paper_id,)).fetchone() is None:
+        return jsonify({'error': 'Paper not found'}), 404
+    
+    related = [related_to_dict(row) for row in related_papers.get_related_papers(conn, paper_id)]
+    
+    return jsonify({'id': paper_id, 'related': related})
+
+# Helper function to shape a search result for the page or the API
+def search_result_to_dict(result):
+    return {
+        'id': result['paper_id'],
+        'arxiv_id': result['arxiv_id'],
+        'title': result['title'],
+        'authors': listing_names(result['authors']),
+        'published_date': result['published_date'],
+        'entry_url': result['entry_url'],
+        'pdf_url': result['pdf_url'],
+        'categories': listing_names(result['categories']),
+        'snippet': result['snippet'],
+        'score': -result['rank']
+    }
+
+@app.route('/search')
+@response_cache.cached
+def search_page():
+    query = request.args.get('q', '').strip()
+    page = max(1, min(request.args.get('page', 1, type=int), config.SEARCH_MAX_PAGES))
+    per_page = config.SEARCH_RESULTS_PER_PAGE
+    
+    conn = get_db_connection()
+    
+    # Get the best matches for the current page
+    results, total_results = search.search_papers(conn, query, per_page, (page - 1) * per_page)
+    
+    papers = []
+    for result in results:
+        paper = search_result_to_dict(result)
+        paper['published_date'] = format_date(paper['published_date'])
+        papers.append(paper)
+    
+    # Calculate pagination info
+    total_pages = min((total_results + per_page - 1) // per_page, config.SEARCH_MAX_PAGES)
+    
+    return render_template(
+        'search.html',
+        query=query,
+        papers=papers,
+        total_results=total_results,
+        page=page,
+        has_prev=page > 1,
+        has_next=page < total_pages
+    )
+
+@app.route('/api/search')
+@response_cache.cached
+def api_search():
+    query = request.args.get('q', '').strip()
+    if not search.build_match_query(query):
+        return jsonify({'error': 'Missing search query'}), 400
+    
+    limit = max(1, min(request.args.get('limit', config.SEARCH_RESULTS_PER_PAGE, type=int), config.API_MAX_PAGE_SIZE))
+    page = max(1, min(request.args.get('page', 1, type=int), config.SEARCH_MAX_PAGES))
+    
+    conn = get_db_connection()
+    
+    results, total_results = search.search_papers(conn, query, limit, (page - 1) * limit)
+    
+    return jsonify({
+        'query': query,
+        'total_results': total_results,
+        'page': page,
+        'results': [search_result_to_dict(result) for result in results]
+    })
+
 @app.route('/stats')
 def stats():
     conn = get_db_connection()
     
-    # Get total number of papers
-    total_papers = conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
-    
-    # Get number of papers with summaries
-    summarized_papers = conn.execute('SELECT COUNT(*) FROM summaries').fetchone()[0]
+    # Get the paper and summary counts kept by the stats triggers
+    counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+    total_papers = counters.get('papers', 0)
+    summarized_papers = counters.get('summaries', 0)
     
     # Get latest retrieval log
     latest_retrieval = conn.execute('''
@@ -266,18 +687,18 @@ def stats():
     
     # Get papers by category
     category_stats = conn.execute('''
-    SELECT c.category_code, COUNT(pc.paper_id) as paper_count
-    FROM categories c
-    JOIN paper_categories pc ON c.id = pc.category_id
-    GROUP BY c.category_code
-    ORDER BY paper_count DESC
+    SELECT c.category_code, s.paper_count
+    FROM category_stats s
+    JOIN categories c ON c.id = s.category_id
+    WHERE s.paper_count > 0
+    ORDER BY s.paper_count DESC
     ''').fetchall()
     
     # Get papers by date
     date_stats = conn.execute('''
-    SELECT strftime('%Y-%m', published_date) as month, COUNT(*) as paper_count
-    FROM papers
-    GROUP BY month
+    SELECT month, paper_count
+    FROM monthly_stats
+    WHERE paper_count > 0
     ORDER BY month DESC
     LIMIT 12
     ''').fetchall()
@@ -290,8 +711,6 @@ def stats():
         'date_stats': [dict(row) for row in date_stats]
     }
     
-    conn.close()
-    
     return render_template('stats.html', stats=stats_data)
 
 @app.template_filter('json')
@@ -312,6 +731,8 @@ def init_db():
         logger.info("Initializing database...")
         arxiv_retrieval.create_database()
         logger.info("Database initialized")
+    else:
+        arxiv_retrieval.migrate_database()
 
 if __name__ == '__main__':
     # Initialize the database
@@ -321,13 +742,12 @@ if __name__ == '__main__':
     # schedule_tasks()
     
     # Run initial retrieval if database is empty
-    conn = get_db_connection()
-    paper_count = conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
-    conn.close()
+    with db.connection(DB_PATH, read_only=True) as conn:
+        paper_count = conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
     
     if paper_count == 0:
         logger.info("No papers in database. Running initial retrieval...")
-        arxiv_retrieval.retrieve_recent_papers(max_results=20)
+        arxiv_retrieval.retrieve_new_papers()
         paper_processor.process_unprocessed_papers()
     
     # Run the Flask app
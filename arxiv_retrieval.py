@@ -1,15 +1,24 @@
 import os
-import sqlite3
+import gzip
+import json
+import argparse
 import arxiv
 import time
+from collections import namedtuple
 from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import config
+import db
+from search import create_search_index
+from related_papers import create_related_tables
+from text_store import create_text_store_tables
 
 # Database setup
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quantum_papers.db')
 
 def create_database():
     """Create the database and tables if they don't exist."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.acquire(DB_PATH)
     cursor = conn.cursor()
     
     # Create tables
@@ -64,6 +73,7 @@ def create_database():
         paper_id INTEGER PRIMARY KEY,
         full_text TEXT NOT NULL,
         extraction_status TEXT NOT NULL,
+        content_hash TEXT,
         FOREIGN KEY (paper_id) REFERENCES papers(id) ON DELETE CASCADE
     );
     
@@ -71,6 +81,8 @@ def create_database():
         paper_id INTEGER PRIMARY KEY,
         brief_summary TEXT NOT NULL,
         extended_summary TEXT NOT NULL,
+        summarizer_version TEXT,
+        input_hash TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (paper_id) REFERENCES papers(id) ON DELETE CASCADE
     );
@@ -92,10 +104,221 @@ def create_database():
     ''')
     
     conn.commit()
-    conn.close()
+    db.release(conn)
+    
+    migrate_database()
     
     print(f"Database created at {DB_PATH}")
 
+# Columns added after the first release, as (table, column, definition)
+ADDED_COLUMNS = [
+    ('full_texts', 'content_hash', 'TEXT'),
+    ('full_texts', 'encoding', "TEXT NOT NULL DEFAULT 'plain'"),
+    ('full_texts', 'blob_segment', 'INTEGER'),
+    ('full_texts', 'blob_offset', 'INTEGER'),
+    ('full_texts', 'blob_length', 'INTEGER'),
+    ('summaries', 'summarizer_version', 'TEXT'),
+    ('summaries', 'input_hash', 'TEXT'),
+]
+
+# Read models derived from the normalized tables and kept up to date on write
+DERIVED_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS paper_listings (
+    paper_id INTEGER PRIMARY KEY,
+    arxiv_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    published_date TIMESTAMP NOT NULL,
+    entry_url TEXT NOT NULL,
+    pdf_url TEXT NOT NULL,
+    authors TEXT NOT NULL,
+    categories TEXT NOT NULL,
+    brief_summary TEXT,
+    FOREIGN KEY (paper_id) REFERENCES papers(id) ON DELETE CASCADE
+);
+
+-- Keyset pagination walks (published_date, paper_id); the id breaks ties between equal dates
+DROP INDEX IF EXISTS idx_paper_listings_published_date;
+CREATE INDEX IF NOT EXISTS idx_paper_listings_published_date_id ON paper_listings(published_date DESC, paper_id DESC);
+
+-- Bumped by every write to the data the web pages show, so caches of
+-- rendered pages know when to drop their entries
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+
+INSERT OR IGNORE INTO data_version (id, version, updated_at) VALUES (1, 0, CURRENT_TIMESTAMP);
+'''
+
+# Tables whose rows the web pages show; any write to them bumps the data version
+VERSIONED_TABLES = ['paper_listings', 'abstracts', 'summaries', 'related_papers']
+
+DERIVED_SCHEMA += ''.join(f'''
+CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_bump_version AFTER {event} ON {table}
+BEGIN
+    UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+''' for table in VERSIONED_TABLES for event in ('INSERT', 'UPDATE', 'DELETE'))
+
+# Statistics kept current by triggers, so the statistics page never scans whole tables
+STATS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS category_stats (
+    category_id INTEGER PRIMARY KEY,
+    paper_count INTEGER NOT NULL,
+    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS monthly_stats (
+    month TEXT PRIMARY KEY,
+    paper_count INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_retrieval_log_run_date ON retrieval_log(run_date DESC);
+
+CREATE TRIGGER IF NOT EXISTS papers_insert_stats AFTER INSERT ON papers
+BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'papers';
+    INSERT INTO monthly_stats (month, paper_count) VALUES (strftime('%Y-%m', NEW.published_date), 1)
+    ON CONFLICT(month) DO UPDATE SET paper_count = paper_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS papers_delete_stats AFTER DELETE ON papers
+BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'papers';
+    UPDATE monthly_stats SET paper_count = paper_count - 1 WHERE month = strftime('%Y-%m', OLD.published_date);
+END;
+
+CREATE TRIGGER IF NOT EXISTS papers_update_stats AFTER UPDATE OF published_date ON papers
+WHEN strftime('%Y-%m', OLD.published_date) IS NOT strftime('%Y-%m', NEW.published_date)
+BEGIN
+    UPDATE monthly_stats SET paper_count = paper_count - 1 WHERE month = strftime('%Y-%m', OLD.published_date);
+    INSERT INTO monthly_stats (month, paper_count) VALUES (strftime('%Y-%m', NEW.published_date), 1)
+    ON CONFLICT(month) DO UPDATE SET paper_count = paper_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS paper_categories_insert_stats AFTER INSERT ON paper_categories
+BEGIN
+    INSERT INTO category_stats (category_id, paper_count) VALUES (NEW.category_id, 1)
+    ON CONFLICT(category_id) DO UPDATE SET paper_count = paper_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS paper_categories_delete_stats AFTER DELETE ON paper_categories
+BEGIN
+    UPDATE category_stats SET paper_count = paper_count - 1 WHERE category_id = OLD.category_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summaries_insert_stats AFTER INSERT ON summaries
+BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'summaries';
+END;
+
+CREATE TRIGGER IF NOT EXISTS summaries_delete_stats AFTER DELETE ON summaries
+BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'summaries';
+END;
+'''
+
+def rebuild_stats(conn):
+    """
+    Recompute the statistics tables from the normalized tables.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM counters")
+    cursor.execute("DELETE FROM category_stats")
+    cursor.execute("DELETE FROM monthly_stats")
+    cursor.execute("INSERT INTO counters (name, value) SELECT 'papers', COUNT(*) FROM papers")
+    cursor.execute("INSERT INTO counters (name, value) SELECT 'summaries', COUNT(*) FROM summaries")
+    cursor.execute("""
+    INSERT INTO category_stats (category_id, paper_count)
+    SELECT category_id, COUNT(*) FROM paper_categories GROUP BY category_id
+    """)
+    cursor.execute("""
+    INSERT INTO monthly_stats (month, paper_count)
+    SELECT strftime('%Y-%m', published_date), COUNT(*) FROM papers GROUP BY 1
+    """)
+
+def migrate_database():
+    """Bring an existing database up to the current schema."""
+    conn = db.acquire(DB_PATH)
+    cursor = conn.cursor()
+    
+    try:
+        for table, column, definition in ADDED_COLUMNS:
+            columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                print(f"Added column {table}.{column}")
+        
+        # Before the derived schema, whose triggers watch related_papers
+        create_related_tables(conn)
+        create_text_store_tables(conn)
+        cursor.executescript(DERIVED_SCHEMA)
+        cursor.executescript(STATS_SCHEMA)
+        
+        # Backfill read models that were created after papers were stored
+        listing_count = cursor.execute("SELECT COUNT(*) FROM paper_listings").fetchone()[0]
+        paper_count = cursor.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+        if listing_count < paper_count:
+            refresh_paper_listings(conn)
+            print(f"Built paper listings for {paper_count} papers")
+        
+        if cursor.execute("SELECT 1 FROM counters WHERE name = 'papers'").fetchone() is None:
+            rebuild_stats(conn)
+            print(f"Built statistics for {paper_count} papers")
+        
+        create_search_index(conn)
+        
+        conn.commit()
+    finally:
+        db.release(conn)
+
+# Rebuilds listing rows from the normalized tables
+REFRESH_LISTINGS_SQL = '''
+INSERT OR REPLACE INTO paper_listings
+    (paper_id, arxiv_id, title, published_date, entry_url, pdf_url, authors, categories, brief_summary)
+SELECT p.id, p.arxiv_id, p.title, p.published_date, p.entry_url, p.pdf_url,
+       (SELECT json_group_array(name) FROM (
+            SELECT a.name
+            FROM authors a
+            JOIN paper_authors pa ON a.id = pa.author_id
+            WHERE pa.paper_id = p.id
+            ORDER BY pa.author_position)),
+       (SELECT json_group_array(category_code) FROM (
+            SELECT c.category_code
+            FROM categories c
+            JOIN paper_categories pc ON c.id = pc.category_id
+            WHERE pc.paper_id = p.id)),
+       s.brief_summary
+FROM papers p
+LEFT JOIN summaries s ON p.id = s.paper_id
+'''
+
+def refresh_paper_listings(conn, paper_ids=None):
+    """
+    Rebuild the denormalized listing rows of some or all papers. The caller commits.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_ids (list): Papers to refresh; all papers if None
+    """
+    cursor = conn.cursor()
+    if paper_ids is None:
+        cursor.execute(REFRESH_LISTINGS_SQL)
+        return
+    
+    for chunk in chunked(list(paper_ids)):
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f"{REFRESH_LISTINGS_SQL} WHERE p.id IN ({placeholders})", chunk)
+
 def get_or_create_category(conn, category_code):
     """Get a category ID or create it if it doesn't exist."""
     cursor = conn.cursor()
@@ -163,57 +386,327 @@ def store_paper(conn, paper):
         cursor.execute("INSERT INTO paper_authors (paper_id, author_id, author_position) VALUES (?, ?, ?)",
                       (paper_id, author_id, i))
     
+    # Keep the listing read model in step
+    refresh_paper_listings(conn, [paper_id])
+    
     return paper_id
 
-def retrieve_recent_papers(max_results=10):
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+MAX_QUERY_PARAMETERS = 500
+
+def chunked(items, size=MAX_QUERY_PARAMETERS):
+    """Split a list into consecutive chunks of at most size items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class PaperIngestor:
+    """
+    Bulk-insert papers, caching author and category IDs across batches.
+    
+    Each batch costs a handful of statements regardless of its size: one
+    existence check for the whole batch, set-based lookups for unseen
+    authors and categories, and executemany inserts, all committed in a
+    single transaction.
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self.author_ids = {}
+        self.category_ids = {}
+    
+    def _resolve_ids(self, table, column, names, cache):
+        missing = sorted({name for name in names if name not in cache})
+        if not missing:
+            return
+        
+        cursor = self.conn.cursor()
+        cursor.executemany(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)",
+                           [(name,) for name in missing])
+        for chunk in chunked(missing):
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"SELECT id, {column} FROM {table} WHERE {column} IN ({placeholders})", chunk)
+            for row_id, name in cursor.fetchall():
+                cache[name] = row_id
+    
+    def existing_arxiv_ids(self, arxiv_ids):
+        """Return the subset of arxiv_ids already stored, in one query per chunk."""
+        cursor = self.conn.cursor()
+        existing = set()
+        for chunk in chunked(list(arxiv_ids)):
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"SELECT arxiv_id FROM papers WHERE arxiv_id IN ({placeholders})", chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
+    
+    def store_batch(self, papers):
+        """
+        Store a batch of papers and their related data in one transaction.
+        
+        Papers that already exist, or repeat earlier papers in the batch,
+        are skipped.
+        
+        Args:
+            papers (list): Paper records with the attributes of arxiv.Result
+                (entry_id, title, published, pdf_url, summary, categories
+                and authors with a name)
+        
+        Returns:
+            list: Database IDs of the newly stored papers
+        """
+        existing = self.existing_arxiv_ids({paper.entry_id for paper in papers})
+        new_papers = []
+        for paper in papers:
+            if paper.entry_id not in existing:
+                existing.add(paper.entry_id)
+                new_papers.append(paper)
+        
+        if not new_papers:
+            return []
+        
+        cursor = self.conn.cursor()
+        try:
+            self._resolve_ids('authors', 'name',
+                              [author.name for paper in new_papers for author in paper.authors],
+                              self.author_ids)
+            self._resolve_ids('categories', 'category_code',
+                              [category for paper in new_papers for category in paper.categories],
+                              self.category_ids)
+            
+            # Insert papers
+            cursor.executemany("""
+            INSERT INTO papers (arxiv_id, title, published_date, entry_url, pdf_url)
+            VALUES (?, ?, ?, ?, ?)
+            """, [(paper.entry_id, paper.title, paper.published.isoformat(), paper.entry_id, paper.pdf_url)
+                  for paper in new_papers])
+            
+            paper_ids = {}
+            for chunk in chunked([paper.entry_id for paper in new_papers]):
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"SELECT id, arxiv_id FROM papers WHERE arxiv_id IN ({placeholders})", chunk)
+                paper_ids.update((arxiv_id, paper_id) for paper_id, arxiv_id in cursor.fetchall())
+            
+            # Insert abstracts, categories and authors
+            cursor.executemany("INSERT INTO abstracts (paper_id, abstract_text) VALUES (?, ?)",
+                               [(paper_ids[paper.entry_id], paper.summary) for paper in new_papers])
+            cursor.executemany("INSERT OR IGNORE INTO paper_categories (paper_id, category_id) VALUES (?, ?)",
+                               [(paper_ids[paper.entry_id], self.category_ids[category])
+                                for paper in new_papers for category in paper.categories])
+            cursor.executemany("INSERT OR IGNORE INTO paper_authors (paper_id, author_id, author_position) VALUES (?, ?, ?)",
+                               [(paper_ids[paper.entry_id], self.author_ids[author.name], i)
+                                for paper in new_papers for i, author in enumerate(paper.authors)])
+            
+            # Keep the listing read model in step
+            refresh_paper_listings(self.conn, paper_ids.values())
+            
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            # IDs inserted by the failed transaction no longer exist
+            self.author_ids.clear()
+            self.category_ids.clear()
+            raise
+        
+        return [paper_ids[paper.entry_id] for paper in new_papers]
+
+def store_papers(conn, papers, batch_size=1000):
     """
-    Retrieve recent papers from arXiv's quant-ph category and store them in the database.
+    Store many papers through the bulk ingest path.
     
     Args:
-        max_results (int): Maximum number of papers to retrieve
+        conn (sqlite3.Connection): Database connection
+        papers (iterable): Paper records, consumed lazily
+        batch_size (int): Papers per transaction
+    
+    Returns:
+        int: Number of new papers stored
+    """
+    ingestor = PaperIngestor(conn)
+    stored_count = 0
+    batch = []
+    
+    for paper in papers:
+        batch.append(paper)
+        if len(batch) >= batch_size:
+            stored_count += len(ingestor.store_batch(batch))
+            batch = []
+    
+    if batch:
+        stored_count += len(ingestor.store_batch(batch))
+    
+    return stored_count
+
+# Paper and author records read from a metadata snapshot, shaped like arxiv.Result
+SnapshotPaper = namedtuple('SnapshotPaper', ['entry_id', 'title', 'published', 'pdf_url',
+                                             'summary', 'categories', 'authors'])
+SnapshotAuthor = namedtuple('SnapshotAuthor', ['name'])
+
+def parse_snapshot_record(record):
+    """
+    Convert one record of the arXiv metadata snapshot into a paper record.
+    
+    URLs point at the latest version, as the arXiv API does, and the
+    publication date is the submission date of the first version.
+    
+    Args:
+        record (dict): A decoded line of the snapshot
+        
+    Returns:
+        SnapshotPaper: The paper, ready for store_papers
+    """
+    latest_version = record['versions'][-1]['version']
+    first_submitted = parsedate_to_datetime(record['versions'][0]['created'])
+    
+    authors = [SnapshotAuthor(' '.join(part for part in (first, last, *suffix) if part))
+               for last, first, *suffix in record['authors_parsed']]
+    
+    return SnapshotPaper(
+        entry_id=f"http://arxiv.org/abs/{record['id']}{latest_version}",
+        title=' '.join(record['title'].split()),
+        published=first_submitted,
+        pdf_url=f"http://arxiv.org/pdf/{record['id']}{latest_version}",
+        summary=record['abstract'].strip(),
+        categories=record['categories'].split(),
+        authors=authors
+    )
+
+def iter_snapshot_papers(path, category):
+    """
+    Stream the papers of one category from an arXiv metadata snapshot.
+    
+    The snapshot is read line by line, so memory use does not depend on its size.
+    
+    Args:
+        path (str): JSON-lines snapshot file, optionally gzip-compressed (.gz)
+        category (str): arXiv category to keep, e.g. 'quant-ph'
+        
+    Yields:
+        SnapshotPaper: Papers listed in the category
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if category not in record['categories'].split():
+                    continue
+                yield parse_snapshot_record(record)
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                print(f"Skipping malformed snapshot line {line_number}: {str(e)}")
+
+def import_metadata_snapshot(path, category=None, batch_size=1000):
+    """
+    Import a category's papers from a local arXiv metadata snapshot.
+    
+    This seeds a deployment without touching the network, using the bulk
+    ingest path one batch at a time.
+    
+    Args:
+        path (str): JSON-lines snapshot file, optionally gzip-compressed (.gz)
+        category (str): arXiv category to import; defaults to config.ARXIV_CATEGORY
+        batch_size (int): Papers per transaction
         
     Returns:
         int: Number of new papers stored
     """
+    if category is None:
+        category = config.ARXIV_CATEGORY
+    
     # Create database if it doesn't exist
     if not os.path.exists(DB_PATH):
         create_database()
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.acquire(DB_PATH)
     
     try:
-        # Search for papers in quant-ph category
-        print(f"Searching for papers in the quant-ph category...")
+        print(f"Importing {category} papers from {path}...")
+        started = time.time()
+        new_papers_count = store_papers(conn, iter_snapshot_papers(path, category), batch_size)
         
-        client = arxiv.Client()
+        message = f"Imported {new_papers_count} new papers from snapshot {os.path.basename(path)}"
+        log_retrieval(conn, new_papers_count, "success", message)
+        print(f"{message} in {time.time() - started:.1f} seconds.")
+        return new_papers_count
+        
+    except Exception as e:
+        conn.rollback()
+        error_message = f"Error importing snapshot: {str(e)}"
+        print(error_message)
+        log_retrieval(conn, 0, "error", error_message)
+        return 0
+    
+    finally:
+        db.release(conn)
+
+def get_high_water_mark(conn):
+    """Get the publication date of the newest stored paper, or None if there are none."""
+    return conn.execute("SELECT MAX(published_date) FROM papers").fetchone()[0]
+
+def retrieve_new_papers(max_results=None, page_size=None):
+    """
+    Retrieve every paper published since the newest stored one.
+    
+    Results are requested newest first and stored batch by batch as they
+    stream in, until a whole batch is already known and reaches back to the
+    stored high-water mark. The arXiv client spaces out its page requests
+    instead of sleeping per result.
+    
+    Args:
+        max_results (int): Upper bound on papers to request; defaults to no
+            bound, or config.ARXIV_MAX_RESULTS when the database is empty
+        page_size (int): Papers per API request and per stored batch;
+            defaults to config.ARXIV_PAGE_SIZE
+        
+    Returns:
+        int: Number of new papers stored, including those stored before an error
+    """
+    if page_size is None:
+        page_size = config.ARXIV_PAGE_SIZE
+    
+    # Create database if it doesn't exist
+    if not os.path.exists(DB_PATH):
+        create_database()
+    
+    conn = db.acquire(DB_PATH)
+    # Batches are committed as they are stored, so an error keeps the earlier ones
+    new_papers_count = 0
+    
+    try:
+        high_water_mark = get_high_water_mark(conn)
+        if high_water_mark is None and max_results is None:
+            max_results = config.ARXIV_MAX_RESULTS
+        
+        print(f"Searching for papers in the {config.ARXIV_CATEGORY} category published since {high_water_mark}...")
+        
+        client = arxiv.Client(page_size=page_size, delay_seconds=config.ARXIV_DELAY)
         search = arxiv.Search(
-            query='cat:quant-ph',
+            query=f'cat:{config.ARXIV_CATEGORY}',
             max_results=max_results,
-            sort_by=arxiv.SortCriterion.SubmittedDate
+            sort_by=arxiv.SortCriterion.SubmittedDate,
+            sort_order=arxiv.SortOrder.Descending
         )
         
-        papers = []
-        for result in client.results(search):
-            papers.append(result)
-            # Be nice to the API with a small delay
-            time.sleep(0.1)
-        
-        if not papers:
-            print("No papers found.")
-            log_retrieval(conn, 0, "success", "No papers found")
-            return 0
-        
-        print(f"Found {len(papers)} papers. Processing...")
+        ingestor = PaperIngestor(conn)
+        batch = []
         
-        # Process each paper
-        new_papers_count = 0
-        for paper in papers:
-            paper_id = store_paper(conn, paper)
-            if paper_id:
-                new_papers_count += 1
-                print(f"Stored paper: {paper.title}")
+        for result in client.results(search):
+            batch.append(result)
+            if len(batch) < page_size:
+                continue
+            
+            new_paper_ids = ingestor.store_batch(batch)
+            new_papers_count += len(new_paper_ids)
+            print(f"Stored {len(new_paper_ids)} new papers from a batch of {len(batch)}")
+            
+            # Stop once a batch brings nothing new and reaches known territory
+            oldest = min(paper.published.isoformat() for paper in batch)
+            batch = []
+            if not new_paper_ids and high_water_mark is not None and oldest <= high_water_mark:
+                break
         
-        conn.commit()
+        if batch:
+            new_papers_count += len(ingestor.store_batch(batch))
         
         # Log the retrieval
         log_retrieval(conn, new_papers_count, "success", f"Retrieved {new_papers_count} new papers")
@@ -223,13 +716,13 @@ def retrieve_recent_papers(max_results=10):
         
     except Exception as e:
         conn.rollback()
-        error_message = f"Error retrieving papers: {str(e)}"
+        error_message = f"Error retrieving papers after storing {new_papers_count} new papers: {str(e)}"
         print(error_message)
-        log_retrieval(conn, 0, "error", error_message)
-        return 0
+        log_retrieval(conn, new_papers_count, "error", error_message)
+        return new_papers_count
     
     finally:
-        conn.close()
+        db.release(conn)
 
 def log_retrieval(conn, papers_retrieved, status, message):
     """Log the retrieval run in the database."""
@@ -245,7 +738,7 @@ def get_last_retrieval_date():
     if not os.path.exists(DB_PATH):
         return None
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.acquire(DB_PATH)
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -255,7 +748,7 @@ def get_last_retrieval_date():
     """)
     
     result = cursor.fetchone()
-    conn.close()
+    db.release(conn)
     
     if result:
         return datetime.fromisoformat(result[0])
@@ -272,9 +765,18 @@ def should_run_retrieval(hours_between_runs=24):
     return time_since_last_run > timedelta(hours=hours_between_runs)
 
 if __name__ == "__main__":
-    if should_run_retrieval():
+    parser = argparse.ArgumentParser(description="Retrieve quant-ph papers from arXiv")
+    parser.add_argument('--import-snapshot', metavar='PATH',
+                        help="import papers from a local arXiv metadata snapshot (JSON lines, optionally .gz) instead of the API")
+    parser.add_argument('--category', default=config.ARXIV_CATEGORY,
+                        help="category to import from the snapshot (default: %(default)s)")
+    args = parser.parse_args()
+    
+    if args.import_snapshot:
+        import_metadata_snapshot(args.import_snapshot, args.category)
+    elif should_run_retrieval():
         print("Starting scheduled paper retrieval...")
-        retrieve_recent_papers(max_results=20)
+        retrieve_new_papers()
     else:
         last_run = get_last_retrieval_date()
         print(f"Skipping retrieval. Last successful run was at {last_run}.")
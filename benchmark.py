@@ -0,0 +1,339 @@
+"""
+Benchmarks for the summarization and PDF extraction hot paths.
+
+Each stage runs on a deterministic synthetic corpus: paper-like documents of
+50 to 5,000 sentences, with section headings and a references section, and
+generated PDFs of 1 to 300 pages. Every case reports its best wall time over
+a few repeats and the peak memory traced by tracemalloc during a separate run
+(tracing slows the code down, so it is never timed).
+
+Results can be saved as a baseline and later runs compared against it:
+
+    python benchmark.py --save-baseline benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json
+
+A case regresses when it is slower or uses more memory than the baseline by
+more than the threshold; the comparison then exits with status 1.
+"""
+
+import io
+import gc
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tracemalloc
+from itertools import accumulate
+import nltk
+import paper_processor
+from pdf_extractor import extract_text_from_pdf
+
+# Words of the synthetic documents, most frequent first
+VOCABULARY = (
+    "the of and a to in is we that for with by on this are as be an which at from it "
+    "quantum state states qubit qubits system systems entanglement measurement error "
+    "correction circuit circuits gate gates noise fidelity phase coherence decoherence "
+    "hamiltonian spin spins photon photons cavity lattice field fields energy ground "
+    "excited operator operators algorithm algorithms protocol channel channels classical "
+    "information entropy density matrix matrices eigenstate eigenvalue amplitude "
+    "interference superposition topological code codes logical physical threshold "
+    "simulation simulations experiment experimental theoretical model models coupling "
+    "interaction interactions dynamics evolution unitary time frequency temperature "
+    "magnetic optical trapped ion ions atom atoms superconducting transmon readout "
+    "tomography benchmark variational optimization parameter parameters bound bounds "
+    "result results show demonstrate propose method approach scheme analysis numerical "
+    "analytical limit regime scaling number large small high low strong weak different"
+).split()
+
+SECTION_NAMES = ['Introduction', 'Background', 'Model', 'Methods', 'Results', 'Discussion', 'Conclusion']
+
+# Characters per line of generated text; lines per generated PDF page
+LINE_WIDTH = 90
+LINES_PER_PAGE = 55
+
+DOCUMENT_SENTENCES = [50, 500, 5000]
+PDF_PAGES = [1, 30, 300]
+SIMILARITY_PAIRS = 2000
+
+# Smallest increase of each measurement that can count as a regression
+MIN_CHANGES = {'seconds': 0.005, 'peak_bytes': 64 * 1024}
+
+def make_sentence(rnd, cumulative_weights):
+    """Make one sentence of 8 to 30 words drawn with Zipf-like frequencies."""
+    words = rnd.choices(VOCABULARY, cum_weights=cumulative_weights, k=rnd.randint(8, 30))
+    return ' '.join(words).capitalize() + '.'
+
+def zipf_weights():
+    """Get the cumulative weights that make word i about 1/(i+1) as frequent as the first."""
+    return list(accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+def wrap_lines(sentences, width=LINE_WIDTH):
+    """Lay sentences out as lines of at most width characters, like extracted PDF text."""
+    lines = []
+    line = ''
+    for word in ' '.join(sentences).split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+def generate_document_lines(num_sentences, seed=0):
+    """
+    Generate the lines of a synthetic paper.
+    
+    The body has numbered section headings and is followed by a references
+    section, so hierarchical summarization sees the structure of a real paper.
+    
+    Args:
+        num_sentences (int): Sentences in the body
+        seed (int): Random seed; equal seeds give equal documents
+    
+    Returns:
+        list: Lines of text
+    """
+    rnd = random.Random(seed)
+    weights = zipf_weights()
+    sections = min(len(SECTION_NAMES), max(1, num_sentences // 20))
+    
+    lines = []
+    written = 0
+    for number in range(sections):
+        count = (num_sentences - written) // (sections - number)
+        lines.append(f"{number + 1} {SECTION_NAMES[number]}")
+        lines.extend(wrap_lines([make_sentence(rnd, weights) for _ in range(count)]))
+        written += count
+    
+    lines.append("References")
+    for number in range(1, 11):
+        lines.append(f"[{number}] A. Author and B. Author, Phys. Rev. Lett. {100 + number}, {number * 1000} (2020).")
+    return lines
+
+def generate_document(num_sentences, seed=0):
+    """
+    Generate the text of a synthetic paper.
+    
+    Args:
+        num_sentences (int): Sentences in the body
+        seed (int): Random seed
+    
+    Returns:
+        str: The text
+    """
+    return '\n'.join(generate_document_lines(num_sentences, seed))
+
+def escape_pdf_string(text):
+    """Escape text for a PDF literal string."""
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def generate_pdf(num_pages, seed=0):
+    """
+    Generate a PDF of synthetic paper text.
+    
+    The PDF uses only a standard font and uncompressed content streams, so
+    it needs no PDF library to write.
+    
+    Args:
+        num_pages (int): Pages in the PDF
+        seed (int): Random seed
+    
+    Returns:
+        bytes: The PDF
+    """
+    # Enough sentences for the pages, then cut to exactly num_pages pages
+    lines = generate_document_lines(num_pages * LINES_PER_PAGE * LINE_WIDTH // 120 + 10, seed)
+    lines = (lines * (1 + num_pages * LINES_PER_PAGE // len(lines)))[:num_pages * LINES_PER_PAGE]
+    
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        ('<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            ' '.join(f'{4 + 2 * page} 0 R' for page in range(num_pages)), num_pages)).encode('ascii'),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+    ]
+    for page in range(num_pages):
+        page_lines = lines[page * LINES_PER_PAGE:(page + 1) * LINES_PER_PAGE]
+        stream = 'BT /F1 9 Tf 40 760 Td 13 TL ' + ' '.join(
+            f"({escape_pdf_string(line)}) '" for line in page_lines) + ' ET'
+        objects.append((f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                        f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * page} 0 R >>').encode('ascii'))
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream'.encode('ascii'))
+    
+    pdf = io.BytesIO()
+    pdf.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(pdf.tell())
+        pdf.write(f'{number} 0 obj\n'.encode('ascii') + body + b'\nendobj\n')
+    xref_offset = pdf.tell()
+    pdf.write(f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('ascii'))
+    pdf.write(b''.join(f'{offset:010d} 00000 n \n'.encode('ascii') for offset in offsets))
+    pdf.write(f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+    return pdf.getvalue()
+
+def tokenized_sentences(num_sentences, seed=0):
+    """Generate word-tokenized sentences, as the summarizer feeds build_similarity_matrix."""
+    rnd = random.Random(seed)
+    weights = zipf_weights()
+    return [nltk.word_tokenize(make_sentence(rnd, weights)) for _ in range(num_sentences)]
+
+def measure(run, repeat):
+    """
+    Time a callable and trace its peak memory.
+    
+    Args:
+        run (callable): The work to measure
+        repeat (int): Timed runs; the best is reported
+    
+    Returns:
+        dict: seconds (best wall time) and peak_bytes (tracemalloc peak)
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {'seconds': min(timings), 'peak_bytes': peak_bytes}
+
+def iter_cases(quick=False):
+    """
+    List the benchmark cases.
+    
+    Args:
+        quick (bool): Skip the largest sizes
+    
+    Yields:
+        tuple: (case name, callable running the case)
+    """
+    stop_words = paper_processor.stopwords.words('english')
+    document_sizes = DOCUMENT_SENTENCES[:-1] if quick else DOCUMENT_SENTENCES
+    pdf_sizes = PDF_PAGES[:-1] if quick else PDF_PAGES
+    
+    sentences = tokenized_sentences(2 * SIMILARITY_PAIRS, seed=1)
+    pairs = list(zip(sentences[::2], sentences[1::2]))
+    yield (f"sentence_similarity[pairs={SIMILARITY_PAIRS}]",
+           lambda: [paper_processor.sentence_similarity(first, second, stop_words) for first, second in pairs])
+    
+    for size in document_sizes:
+        sentences = tokenized_sentences(size, seed=size)
+        yield (f"build_similarity_matrix[sentences={size}]",
+               lambda sentences=sentences: paper_processor.build_similarity_matrix(sentences, stop_words))
+    
+    for size in document_sizes:
+        text = generate_document(size, seed=size)
+        yield (f"generate_summary[sentences={size}]",
+               lambda text=text: paper_processor.generate_summary(text, 10))
+    
+    # Long papers are summarized section by section
+    text = generate_document(document_sizes[-1], seed=document_sizes[-1])
+    yield (f"generate_summaries[sentences={document_sizes[-1]},hierarchical]",
+           lambda: paper_processor.generate_summaries(text, [3, 10], hierarchical=True))
+    
+    for pages in pdf_sizes:
+        pdf = generate_pdf(pages, seed=pages)
+        yield f"extract_text_from_pdf[pages={pages}]", lambda pdf=pdf: extract_text_from_pdf(pdf)
+
+def run_benchmarks(repeat=3, quick=False, only=None):
+    """
+    Run the benchmark cases, printing each result as it completes.
+    
+    Args:
+        repeat (int): Timed runs per case
+        quick (bool): Skip the largest sizes
+        only (str): Run only the cases whose name contains this string
+    
+    Returns:
+        dict: Case name to its measurements
+    """
+    paper_processor.download_nltk_resources()
+    results = {}
+    for name, run in iter_cases(quick):
+        if only and only not in name:
+            continue
+        results[name] = measure(run, repeat)
+        print(f"{name:<45} {results[name]['seconds'] * 1000:>10.1f} ms {results[name]['peak_bytes'] / 1024 ** 2:>9.1f} MB")
+    return results
+
+def compare_results(results, baseline, threshold):
+    """
+    Find the cases that got slower or use more memory than their baseline.
+    
+    Increases smaller than MIN_CHANGES are timer and allocator noise on the
+    smallest cases and are never flagged.
+    
+    Args:
+        results (dict): Case name to measurements, from run_benchmarks
+        baseline (dict): The same for the baseline run
+        threshold (float): Allowed relative increase, e.g. 0.1 for 10%
+    
+    Returns:
+        list: (case name, metric, baseline value, current value) per regression
+    """
+    regressions = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        for metric, min_change in MIN_CHANGES.items():
+            before, after = baseline[name][metric], current[metric]
+            if after > before * (1 + threshold) and after - before > min_change:
+                regressions.append((name, metric, before, after))
+    return regressions
+
+def format_change(metric, before, after):
+    """Describe a measurement's change for the comparison report."""
+    if metric == 'seconds':
+        values = f"{before * 1000:.1f} ms -> {after * 1000:.1f} ms"
+    else:
+        values = f"{before / 1024 ** 2:.1f} MB -> {after / 1024 ** 2:.1f} MB"
+    return f"{values} ({(after / before - 1) * 100 if before else float('inf'):+.0f}%)"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark summarization and PDF extraction.")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case (default 3)")
+    parser.add_argument('--quick', action='store_true', help="skip the largest documents and PDFs")
+    parser.add_argument('--only', help="run only the cases whose name contains this string")
+    parser.add_argument('--save-baseline', metavar='PATH', help="write the results to a baseline file")
+    parser.add_argument('--compare', metavar='PATH', help="compare the results with a baseline file")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative slowdown or memory growth flagged as a regression (default 0.1)")
+    args = parser.parse_args()
+    
+    # Keep per-call log lines of the code under test out of the report
+    logging.disable(logging.INFO)
+    
+    results = run_benchmarks(args.repeat, args.quick, args.only)
+    
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results
+            }, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save_baseline}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare_results(results, baseline, args.threshold)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name} {metric}: {format_change(metric, before, after)}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
@@ -0,0 +1,184 @@
+"""
+Append-only segment files for large extracted texts.
+
+Full texts kept inline in SQLite bloat the full_texts B-tree and slow down
+VACUUM and backups. With FULL_TEXT_STORAGE = 'blob_store' their (encoded)
+payloads are appended to numbered segment files instead, and the database
+only records each payload's segment, offset and length. Segments are never
+rewritten: a new version of a text is appended and the old bytes become
+garbage, which `python blob_store.py --stats` reports.
+
+Reads memory-map whole segments and hand out memoryview slices of the
+mapping, so scanning the corpus copies nothing until a text is decoded.
+Appends take an exclusive lock on the store directory, so several worker
+processes can share a store.
+"""
+
+import os
+import mmap
+import fcntl
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+import config
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.seg'
+
+class BlobStore:
+    """Payloads appended to numbered segment files and read through mmap."""
+    
+    def __init__(self, store_dir, segment_max_bytes):
+        """
+        Args:
+            store_dir (str): Directory holding the segment files
+            segment_max_bytes (int): Size at which a new segment is started
+        """
+        self.store_dir = store_dir
+        self.segment_max_bytes = segment_max_bytes
+        self._maps = {}
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+    
+    def segment_path(self, segment):
+        """Get the path of a segment file by number."""
+        return os.path.join(self.store_dir, f"{segment:06d}{SEGMENT_SUFFIX}")
+    
+    def segments(self):
+        """
+        List the segment numbers in the store.
+        
+        Returns:
+            list: Segment numbers, ascending
+        """
+        return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.store_dir)
+                      if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit())
+    
+    @contextmanager
+    def _append_lock(self):
+        # Serializes appends across threads and processes sharing the store
+        with self._lock, open(os.path.join(self.store_dir, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def append(self, data):
+        """
+        Append a payload to the current segment, starting a new one when it is full.
+        
+        The data is flushed to disk before returning, so a database row that
+        points at it can be committed safely.
+        
+        Args:
+            data (bytes): The payload
+        
+        Returns:
+            tuple: (segment, offset, length)
+        """
+        with self._append_lock():
+            segments = self.segments()
+            segment = segments[-1] if segments else 1
+            path = self.segment_path(segment)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size and size + len(data) > self.segment_max_bytes:
+                segment += 1
+                path = self.segment_path(segment)
+                size = 0
+            
+            with open(path, 'ab') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        return segment, size, len(data)
+    
+    def _map(self, segment, end):
+        # Map the segment, remapping it once it has grown past the current mapping
+        with self._lock:
+            mapping = self._maps.get(segment)
+            if mapping is None or len(mapping) < end:
+                with open(self.segment_path(segment), 'rb') as f:
+                    mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                # Earlier mappings stay open while slices of them are in use
+                self._maps[segment] = mapping
+            return mapping
+    
+    def read(self, segment, offset, length):
+        """
+        Read a payload without copying it.
+        
+        Args:
+            segment (int): Segment number
+            offset (int): Offset of the payload in the segment
+            length (int): Length of the payload
+        
+        Returns:
+            memoryview: The payload, backed by the memory mapping
+        
+        Raises:
+            ValueError: If the segment is shorter than the payload's end
+        """
+        if length == 0:
+            return memoryview(b'')
+        mapping = self._map(segment, offset + length)
+        if len(mapping) < offset + length:
+            raise ValueError(f"Blob at {offset}+{length} is past the end of segment {segment}")
+        return memoryview(mapping)[offset:offset + length]
+    
+    def stats(self, live_bytes=None):
+        """
+        Get the store's size.
+        
+        Args:
+            live_bytes (int): Bytes still referenced by the database, if known
+        
+        Returns:
+            dict: segments, bytes, and garbage bytes when live_bytes is given
+        """
+        segments = self.segments()
+        total_bytes = sum(os.path.getsize(self.segment_path(segment)) for segment in segments)
+        stats = {'segments': len(segments), 'bytes': total_bytes}
+        if live_bytes is not None:
+            stats['garbage_bytes'] = total_bytes - live_bytes
+        return stats
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_blob_store(store_dir=None):
+    """
+    Get the process-wide blob store for a directory.
+    
+    Args:
+        store_dir (str): Store directory (defaults to config.BLOB_STORE_DIR)
+    
+    Returns:
+        BlobStore: The shared store
+    """
+    store_dir = os.path.abspath(store_dir or config.BLOB_STORE_DIR)
+    with _stores_lock:
+        store = _stores.get(store_dir)
+        if store is None:
+            store = BlobStore(store_dir, config.BLOB_SEGMENT_MAX_BYTES)
+            _stores[store_dir] = store
+        return store
+
+if __name__ == "__main__":
+    import db
+    
+    parser = argparse.ArgumentParser(description="Inspect the full text blob store.")
+    parser.add_argument('--stats', action='store_true', help="show the store's size and garbage")
+    args = parser.parse_args()
+    
+    if args.stats:
+        with db.connection(config.DB_PATH, read_only=True) as conn:
+            live_bytes = conn.execute(
+                "SELECT COALESCE(SUM(blob_length), 0) FROM full_texts WHERE blob_segment IS NOT NULL").fetchone()[0]
+        stats = get_blob_store().stats(live_bytes)
+        print(f"{stats['segments']} segments, {stats['bytes'] / 1024 ** 2:.1f} MB, "
+              f"{stats['garbage_bytes'] / 1024 ** 2:.1f} MB no longer referenced")
+    else:
+        parser.print_help()
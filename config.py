@@ -9,16 +9,70 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Database settings
 DB_PATH = os.path.join(BASE_DIR, 'quantum_papers.db')
+DB_POOL_SIZE = 4  # Idle connections kept open per database and mode
+DB_BUSY_TIMEOUT = 30  # Seconds to wait for a lock held by another connection
+DB_SYNCHRONOUS = 'NORMAL'  # With WAL, only a power loss can drop the latest commits
+DB_CACHE_SIZE_KB = 64 * 1024  # Page cache per connection
+DB_MMAP_SIZE = 256 * 1024 ** 2  # Bytes of the database file read through memory mapping
+FULL_TEXT_COMPRESSION = 'zlib'  # How new full texts are stored: 'zlib' or None for plain text
+FULL_TEXT_COMPRESSION_LEVEL = 6  # zlib level, 1 (fastest) to 9 (smallest)
+FULL_TEXT_USE_DICTIONARY = True  # Compress with the newest trained dictionary, if one has been trained
+FULL_TEXT_DICTIONARY_SAMPLE = 200  # Full texts sampled to train a dictionary
+FULL_TEXT_MIGRATION_BATCH_SIZE = 200  # Full texts rewritten per transaction by text_store.py --compress
+FULL_TEXT_STORAGE = 'database'  # Where full texts live: 'database' or 'blob_store' (segment files, memory-mapped reads)
+BLOB_STORE_DIR = os.path.join(BASE_DIR, 'data', 'blobs')
+BLOB_SEGMENT_MAX_BYTES = 1024 ** 3  # Start a new segment file beyond 1 GB
 
 # arXiv API settings
 ARXIV_CATEGORY = 'quant-ph'  # Quantum Physics category
 ARXIV_MAX_RESULTS = 20  # Maximum number of papers to retrieve per run
 ARXIV_SORT_BY = 'submittedDate'  # Sort papers by submission date
-ARXIV_DELAY = 0.1  # Delay between API requests in seconds
+ARXIV_DELAY = 3.0  # Delay between API requests in seconds, per arXiv's usage guidelines
+ARXIV_PAGE_SIZE = 100  # Papers per API request and per stored batch
+
+# PDF download settings
+PDF_DOWNLOAD_WORKERS = 8  # Concurrent PDF downloads
+PDF_DOWNLOAD_PER_HOST_LIMIT = 4  # Maximum downloads in flight to a single host
+PDF_DOWNLOAD_MIN_INTERVAL = 0.5  # Minimum seconds between download starts to a single host
+PDF_CACHE_ENABLED = True  # Keep downloaded PDFs on disk across runs
+PDF_CACHE_DIR = os.path.join(BASE_DIR, 'data', 'pdf_cache')
+PDF_CACHE_MAX_BYTES = 5 * 1024 ** 3  # Evict least recently used PDFs beyond 5 GB
+PARALLEL_EXTRACTION_WORKERS = os.cpu_count() or 1  # Processes used to extract large PDFs; summary worker processes split these between them
+PARALLEL_EXTRACTION_MIN_PAGES = 60  # Smaller PDFs are extracted in a single process
 
 # Paper processing settings
 BRIEF_SUMMARY_SENTENCES = 3  # Number of sentences in brief summary
 EXTENDED_SUMMARY_SENTENCES = 10  # Number of sentences in extended summary
+PAGERANK_TOLERANCE = 1e-6  # Convergence tolerance for sentence ranking
+PAGERANK_MAX_ITERATIONS = 100  # Iteration cap for sentence ranking
+SIMILARITY_TOP_K = None  # Keep only the k strongest edges per sentence (None keeps all)
+HIERARCHICAL_MIN_CHARACTERS = 50000  # Summarize longer texts section by section
+MAX_SECTION_SENTENCES = 400  # Largest block of sentences ranked together in hierarchical mode
+PROCESSING_WORKERS = os.cpu_count() or 1  # Processes used to summarize papers in parallel
+PROCESSING_PREFETCH = 2  # Papers in flight per worker process, downloading or waiting to be summarized
+PIPELINED_PROCESSING = True  # Overlap downloads, extraction, summarization and storage
+PIPELINE_DOWNLOAD_WORKERS = 4  # Concurrent downloads in the processing pipeline
+PIPELINE_EXTRACT_WORKERS = PROCESSING_WORKERS  # Papers extracted concurrently in the pipeline
+PIPELINE_SUMMARIZE_WORKERS = PROCESSING_WORKERS  # Papers summarized concurrently in the pipeline
+PIPELINE_QUEUE_SIZE = 8  # Papers waiting in front of each pipeline stage
+PIPELINE_METRICS_INTERVAL = 60  # Seconds between pipeline metrics log lines
+RELATED_PAPERS_K = 10  # Related papers stored per paper
+RELATED_PAPERS_MIN_SCORE = 0.05  # Least cosine similarity of a related paper
+RELATED_PAPERS_MAX_DF = 0.5  # Terms in a larger fraction of papers are ignored
+RELATED_PAPERS_MAX_TERMS = 30  # Highest weighted terms kept per paper
+RELATED_PAPERS_BLOCK_SIZE = 128  # Papers compared per matrix product; memory grows with block size x corpus size
+
+# Web application settings
+PAPERS_PER_PAGE = 10  # Papers on each listing page
+API_MAX_PAGE_SIZE = 100  # Largest page the JSON API returns
+API_EXPORT_BATCH_SIZE = 500  # Papers read per query when the API streams an export
+RESPONSE_CACHE_MAX_ENTRIES = 1024  # Rendered pages kept in memory
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 ** 2  # Total size of the rendered pages kept in memory
+DATA_VERSION_POLL_SECONDS = 1.0  # How often cached pages check whether the data changed
+SEARCH_RESULTS_PER_PAGE = 10  # Search results on each page
+SEARCH_MAX_PAGES = 50  # Deepest search results page served
+SEARCH_SNIPPET_TOKENS = 24  # Length of the highlighted snippet shown with each result
+SEARCH_INDEX_FULL_TEXT = False  # Also search full texts; roughly doubles the database size
 
 # Scheduler settings
 RETRIEVAL_INTERVAL_HOURS = 24  # Run paper retrieval every 24 hours
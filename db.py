@@ -0,0 +1,202 @@
+"""
+Shared SQLite connection layer.
+
+Connections are pooled per database file and mode, so web requests and
+worker jobs reuse open connections (and their page caches) instead of
+reconnecting every time. Every connection is tuned for concurrent use: the
+database runs in WAL mode, which lets readers keep working while the worker
+holds a long write transaction, and the web tier reads through read-only
+connections. Pools notice when they have been inherited by a forked worker
+process and start over with fresh connections.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from urllib.parse import quote
+from contextlib import contextmanager
+import config
+import text_store
+
+logger = logging.getLogger(__name__)
+
+class PooledConnection(sqlite3.Connection):
+    """A connection that remembers its pool and the process that opened it."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.pid = os.getpid()
+
+def configure_connection(conn, read_only=False):
+    """
+    Apply the configured pragmas to a new connection and register its SQL functions.
+    
+    Args:
+        conn: Database connection
+        read_only (bool): Whether the connection is read-only
+    """
+    if not read_only:
+        # Persistent once set, but cheap to repeat
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={config.DB_SYNCHRONOUS}")
+    else:
+        conn.execute("PRAGMA query_only=1")
+    conn.execute(f"PRAGMA cache_size={-int(config.DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size={int(config.DB_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA busy_timeout={int(config.DB_BUSY_TIMEOUT * 1000)}")
+    # Lets SQL read compressed full texts
+    text_store.register_functions(conn)
+
+class ConnectionPool:
+    """Idle connections to one database file, opened in one mode."""
+    
+    def __init__(self, db_path, read_only=False, max_idle=4):
+        """
+        Args:
+            db_path (str): Path of the database file
+            read_only (bool): Open connections with mode=ro
+            max_idle (int): Most idle connections kept open for reuse
+        """
+        self.db_path = db_path
+        self.read_only = read_only
+        self.max_idle = max_idle
+        self._idle = []
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+    
+    def _open(self):
+        if self.read_only:
+            target = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+        else:
+            target = self.db_path
+        # Connections move between threads, but only one uses a connection at a time
+        conn = sqlite3.connect(target, uri=self.read_only, timeout=config.DB_BUSY_TIMEOUT,
+                               check_same_thread=False, factory=PooledConnection)
+        configure_connection(conn, self.read_only)
+        conn.pool = self
+        return conn
+    
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # SQLite connections must not be used, or closed, across a fork
+            _inherited.extend(self._idle)
+            self._idle = []
+            self._pid = os.getpid()
+    
+    def acquire(self):
+        """
+        Get an idle connection, opening a new one if none is available.
+        
+        Returns:
+            PooledConnection: The connection; hand it back with release
+        """
+        with self._lock:
+            self._check_pid()
+            if self._idle:
+                return self._idle.pop()
+        return self._open()
+    
+    def release(self, conn):
+        """
+        Return a connection to the pool.
+        
+        Any transaction the caller left open is rolled back, so it cannot
+        hold locks while the connection sits idle.
+        
+        Args:
+            conn (PooledConnection): Connection from acquire
+        """
+        if conn.pid != os.getpid():
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._check_pid()
+            if len(self._idle) < self.max_idle:
+                conn.row_factory = None
+                self._idle.append(conn)
+                return
+        conn.close()
+    
+    def close_all(self):
+        """Close every idle connection."""
+        with self._lock:
+            self._check_pid()
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+# Pools by (database path, read_only)
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Connections inherited from a parent process, kept referenced so they are never closed here
+_inherited = []
+
+def get_pool(db_path=None, read_only=False):
+    """
+    Get the shared pool for a database file and mode.
+    
+    Args:
+        db_path (str): Path of the database file (defaults to config.DB_PATH)
+        read_only (bool): Whether the pool hands out read-only connections
+    
+    Returns:
+        ConnectionPool: The pool
+    """
+    key = (os.path.abspath(db_path or config.DB_PATH), read_only)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(key[0], read_only, config.DB_POOL_SIZE)
+            _pools[key] = pool
+        return pool
+
+def acquire(db_path=None, read_only=False):
+    """
+    Get a pooled connection.
+    
+    Args:
+        db_path (str): Path of the database file (defaults to config.DB_PATH)
+        read_only (bool): Get a read-only connection
+    
+    Returns:
+        PooledConnection: The connection; hand it back with release
+    """
+    return get_pool(db_path, read_only).acquire()
+
+def release(conn):
+    """
+    Return a connection from acquire to its pool.
+    
+    Args:
+        conn (PooledConnection): The connection
+    """
+    conn.pool.release(conn)
+
+@contextmanager
+def connection(db_path=None, read_only=False):
+    """
+    Borrow a pooled connection for the duration of a with block.
+    
+    Args:
+        db_path (str): Path of the database file (defaults to config.DB_PATH)
+        read_only (bool): Get a read-only connection
+    
+    Yields:
+        PooledConnection: The connection
+    """
+    conn = acquire(db_path, read_only)
+    try:
+        yield conn
+    finally:
+        release(conn)
+
+def close_all():
+    """Close the idle connections of every pool."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
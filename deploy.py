@@ -45,8 +45,8 @@ def check_dependencies():
         import arxiv
         import nltk
         import PyPDF2
-        import networkx
         import numpy
+        import scipy
         import requests
         
         logger.info("All required packages are installed")
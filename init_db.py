@@ -7,6 +7,7 @@ This script creates the SQLite database and all required tables.
 import os
 import sqlite3
 import logging
+import arxiv_retrieval
 
 # Set up logging
 logging.basicConfig(
@@ -82,6 +83,7 @@ def create_database():
         paper_id INTEGER PRIMARY KEY,
         full_text TEXT NOT NULL,
         extraction_status TEXT NOT NULL,
+        content_hash TEXT,
         FOREIGN KEY (paper_id) REFERENCES papers(id) ON DELETE CASCADE
     );
     
@@ -89,6 +91,8 @@ def create_database():
         paper_id INTEGER PRIMARY KEY,
         brief_summary TEXT NOT NULL,
         extended_summary TEXT NOT NULL,
+        summarizer_version TEXT,
+        input_hash TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (paper_id) REFERENCES papers(id) ON DELETE CASCADE
     );
@@ -116,6 +120,10 @@ def create_database():
     conn.commit()
     conn.close()
     
+    # Derived read models and later schema changes live with the retrieval code
+    logger.info("Applying schema migrations...")
+    arxiv_retrieval.migrate_database()
+    
     logger.info(f"Database created successfully at {DB_PATH}")
     return True
 
@@ -1,12 +1,19 @@
 import os
-import sqlite3
+import re
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 import nltk
 from nltk.tokenize import sent_tokenize
 from nltk.corpus import stopwords
 from nltk.cluster.util import cosine_distance
 import numpy as np
-import networkx as nx
-from pdf_extractor import get_full_paper_text
+from scipy import sparse
+from pdf_extractor import get_full_paper_text, download_pdf_to_file, extract_text_from_pdf_file
+from pipeline import Pipeline, Stage
+import config
+import db
+import search
+import text_store
 import logging
 
 # Set up logging
@@ -23,6 +30,21 @@ logger = logging.getLogger(__name__)
 # Database setup
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quantum_papers.db')
 
+# Bump when a change to the summarization algorithm should refresh stored summaries
+SUMMARIZER_ALGORITHM_VERSION = 3
+
+def get_summarizer_version():
+    """Identify the summarizer algorithm together with the settings that shape its output."""
+    return (f"{SUMMARIZER_ALGORITHM_VERSION}"
+            f":brief={config.BRIEF_SUMMARY_SENTENCES}"
+            f":extended={config.EXTENDED_SUMMARY_SENTENCES}"
+            f":top_k={config.SIMILARITY_TOP_K}"
+            f":hierarchical={config.HIERARCHICAL_MIN_CHARACTERS}/{config.MAX_SECTION_SENTENCES}")
+
+def fingerprint_text(text):
+    """Get the content hash stored alongside a paper's full text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
 # Ensure NLTK resources are downloaded
 def download_nltk_resources():
     """Download required NLTK resources if not already present."""
@@ -36,6 +58,40 @@ def download_nltk_resources():
     except LookupError:
         nltk.download('stopwords')
 
+# Section names recognised as headings, in lowercase
+SECTION_NAMES = ('abstract', 'introduction', 'background', 'related work', 'preliminaries',
+                 'methods', 'method', 'methodology', 'model', 'theory', 'setup', 'experimental setup',
+                 'experiments', 'experiment', 'results and discussion', 'results', 'discussion',
+                 'analysis', 'conclusions', 'conclusion', 'summary', 'outlook',
+                 'acknowledgements', 'acknowledgments', 'acknowledgement', 'acknowledgment',
+                 'references', 'bibliography', 'appendices', 'supplementary material',
+                 'supplemental material')
+
+def section_name_variants(name):
+    """Spell a section name the ways headings do: 'Related work', 'Related Work', 'RELATED WORK'."""
+    return sorted({name.capitalize(), name.title(), name.upper()}, key=len, reverse=True)
+
+# Section headings recognised in extracted paper text. Matching is case
+# sensitive, since wrapped lines of prose ("results in the ...") are
+# lowercase: the keyword must be capitalised or in capitals, optionally
+# numbered ("2.", "II.", "A") and, if numbered, followed by a short title
+SECTION_HEADING_PATTERN = re.compile(
+    r'^(?P<number>(?:\d+(?:\.\d+)*|[IVX]+|[A-Z])[.)]?\s+)?'
+    r'(?P<name>' + '|'.join(variant for name in SECTION_NAMES for variant in section_name_variants(name)) + r')'
+    r'(?:\s*[.:]?\s*$|(?P<rest>\s*[.:]?\s+[^\s,;].*)$)'
+)
+
+# Appendix headings: "Appendix", "APPENDIX B", "Appendix A: Proofs", "Appendix 2. Derivations"
+APPENDIX_HEADING_PATTERN = re.compile(
+    r'^(?:Appendix|APPENDIX)(?:\s+(?:[A-Z]|\d+|[IVX]+))?(?:\s*[.:]\s*(?:\S.*)?)?\s*$'
+)
+
+# Sections that carry no summary-worthy prose
+SKIPPED_SECTIONS = ('acknowledgment', 'acknowledgement', 'references', 'bibliography',
+                    'appendix', 'appendices', 'supplementary material', 'supplemental material')
+
+MAX_HEADING_LENGTH = 80
+
 # Text preprocessing functions
 def preprocess_text(text):
     """Clean and preprocess text for summarization."""
@@ -43,6 +99,82 @@ def preprocess_text(text):
     text = ' '.join(text.split())
     return text
 
+def match_section_heading(line):
+    """
+    Recognise a section heading line in extracted paper text.
+    
+    Args:
+        line (str): A single line of text
+    
+    Returns:
+        str: The lowercased section name, or None if the line is not a heading
+    """
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_LENGTH:
+        return None
+    
+    if APPENDIX_HEADING_PATTERN.match(line):
+        return 'appendix'
+    
+    match = SECTION_HEADING_PATTERN.match(line)
+    if not match:
+        return None
+    
+    # A bare keyword is a heading; with trailing text it must be numbered
+    # ("2. Results of the ...")
+    if match.group('rest') and not match.group('number'):
+        return None
+    
+    return match.group('name').lower()
+
+def iter_sections(text):
+    """
+    Split extracted paper text into sections, dropping back matter.
+    
+    Text before the first recognised heading is returned as a section named
+    None. Acknowledgements, references, bibliographies, appendices and
+    supplementary material are skipped; a section heading found after them
+    starts a section that is kept again, so a line misread as back matter
+    only costs the text up to the next heading.
+    
+    Args:
+        text (str): Text as returned by pdf_extractor, with line breaks intact
+    
+    Yields:
+        tuple: (section_name, section_text) in document order
+    """
+    name = None
+    lines = []
+    
+    for line in text.splitlines():
+        heading = match_section_heading(line)
+        if heading is None:
+            lines.append(line)
+            continue
+        
+        section_text = '\n'.join(lines)
+        if section_text.strip() and not (name or '').startswith(SKIPPED_SECTIONS):
+            yield name, section_text
+        
+        lines = []
+        name = heading
+    
+    section_text = '\n'.join(lines)
+    if section_text.strip() and not (name or '').startswith(SKIPPED_SECTIONS):
+        yield name, section_text
+
+def split_into_sections(text):
+    """
+    Split extracted paper text into sections, dropping back matter.
+    
+    Args:
+        text (str): Text as returned by pdf_extractor, with line breaks intact
+    
+    Returns:
+        list: List of (section_name, section_text) tuples in document order
+    """
+    return list(iter_sections(text))
+
 def sentence_similarity(sent1, sent2, stopwords=None):
     """Calculate the cosine similarity between two sentences."""
     if stopwords is None:
@@ -69,31 +201,159 @@ def sentence_similarity(sent1, sent2, stopwords=None):
     
     return 1 - cosine_distance(vector1, vector2)
 
-def build_similarity_matrix(sentences, stop_words):
-    """Create a similarity matrix for all sentences."""
-    # Create an empty similarity matrix
-    similarity_matrix = np.zeros((len(sentences), len(sentences)))
+def build_term_matrix(sentences, stop_words):
+    """
+    Build a sparse sentence-by-term count matrix for a tokenized document.
+    
+    Words are lowercased and stop words are skipped, exactly as in
+    sentence_similarity, so row i holds the term counts of sentences[i].
     
-    for idx1 in range(len(sentences)):
-        for idx2 in range(len(sentences)):
-            if idx1 == idx2:  # Same sentences
+    Args:
+        sentences (list): List of tokenized sentences (lists of words)
+        stop_words (iterable): Words to ignore
+    
+    Returns:
+        scipy.sparse.csr_matrix: Matrix of shape (len(sentences), vocabulary size)
+    """
+    stop_words = set(stop_words)
+    vocabulary = {}
+    rows = []
+    columns = []
+    
+    for row, sentence in enumerate(sentences):
+        for word in sentence:
+            word = word.lower()
+            if word in stop_words:
                 continue
-            
-            similarity_matrix[idx1][idx2] = sentence_similarity(
-                sentences[idx1], sentences[idx2], stop_words)
+            rows.append(row)
+            columns.append(vocabulary.setdefault(word, len(vocabulary)))
+    
+    # Duplicate (row, column) pairs are summed, which yields the term counts
+    data = np.ones(len(rows), dtype=np.float64)
+    shape = (len(sentences), max(len(vocabulary), 1))
+    return sparse.csr_matrix((data, (rows, columns)), shape=shape)
+
+def build_sparse_similarity_matrix(sentences, stop_words, top_k=None):
+    """
+    Create a sparse cosine similarity matrix for all sentences.
+    
+    All pairwise similarities are computed in one sparse matrix product over
+    the document's term-count matrix, giving the same scores as calling
+    sentence_similarity for every pair. Sentences without any non-stop-word
+    terms get a similarity of 0 to everything.
+    
+    Args:
+        sentences (list): List of tokenized sentences (lists of words)
+        stop_words (iterable): Words to ignore
+        top_k (int): If set, keep only each sentence's top_k strongest edges
+            (an edge survives if either endpoint keeps it)
+    
+    Returns:
+        scipy.sparse.csr_matrix: Symmetric (n x n) matrix with a zero diagonal
+    """
+    if not sentences:
+        return sparse.csr_matrix((0, 0))
+    
+    term_matrix = build_term_matrix(sentences, stop_words)
+    
+    # L2-normalise every row so the Gram matrix holds cosine similarities
+    norms = np.sqrt(np.asarray(term_matrix.multiply(term_matrix).sum(axis=1)).ravel())
+    inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = sparse.diags(inverse_norms) @ term_matrix
+    
+    similarity_matrix = (normalized @ normalized.T).tocsr()
+    similarity_matrix.setdiag(0.0)
+    similarity_matrix.eliminate_zeros()
+    
+    if top_k is not None:
+        similarity_matrix = keep_top_k_edges(similarity_matrix, top_k)
     
     return similarity_matrix
 
-def generate_summary(text, num_sentences=5):
+def keep_top_k_edges(similarity_matrix, top_k):
     """
-    Generate a summary of the given text using extractive summarization.
+    Sparsify a similarity matrix to the strongest top_k edges per sentence.
     
     Args:
-        text (str): The text to summarize
-        num_sentences (int): Number of sentences to include in the summary
-        
+        similarity_matrix (scipy.sparse.csr_matrix): Symmetric similarity matrix
+        top_k (int): Number of edges to keep for each sentence
+    
     Returns:
-        str: The generated summary
+        scipy.sparse.csr_matrix: The pruned, still symmetric, matrix
+    """
+    pruned = similarity_matrix.copy()
+    for row in range(pruned.shape[0]):
+        start, end = pruned.indptr[row], pruned.indptr[row + 1]
+        if end - start <= top_k:
+            continue
+        row_data = pruned.data[start:end]
+        weakest = np.argpartition(row_data, -top_k)[:-top_k]
+        row_data[weakest] = 0.0
+    pruned.eliminate_zeros()
+    
+    # Keep the graph undirected: an edge kept by either endpoint survives
+    return pruned.maximum(pruned.T).tocsr()
+
+def build_similarity_matrix(sentences, stop_words):
+    """
+    Create a similarity matrix for all sentences.
+    
+    Args:
+        sentences (list): List of tokenized sentences (lists of words)
+        stop_words (iterable): Words to ignore
+    
+    Returns:
+        numpy.ndarray: Dense (n x n) similarity matrix with a zero diagonal
+    """
+    return build_sparse_similarity_matrix(sentences, stop_words).toarray()
+
+def pagerank(similarity_matrix, damping=0.85, tol=1e-6, max_iter=100):
+    """
+    Rank the nodes of a weighted undirected graph with power-iteration PageRank.
+    
+    Works directly on the (sparse or dense) adjacency matrix and follows the
+    same conventions as networkx.pagerank: weights are normalised per row,
+    dangling nodes spread their score uniformly, and iteration stops once
+    the L1 change drops below n * tol.
+    
+    Args:
+        similarity_matrix: (n x n) non-negative adjacency matrix
+        damping (float): Damping factor
+        tol (float): Convergence tolerance
+        max_iter (int): Maximum number of power iterations
+    
+    Returns:
+        numpy.ndarray: One score per node, summing to 1
+    """
+    matrix = sparse.csr_matrix(similarity_matrix)
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    
+    out_weights = np.asarray(matrix.sum(axis=1)).ravel()
+    dangling = out_weights == 0
+    inverse_weights = np.divide(1.0, out_weights, out=np.zeros_like(out_weights), where=~dangling)
+    transition = (sparse.diags(inverse_weights) @ matrix).T.tocsr()
+    
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        previous = scores
+        scores = damping * (transition @ previous + previous[dangling].sum() / n) + (1.0 - damping) / n
+        if np.abs(scores - previous).sum() < n * tol:
+            return scores
+    
+    logger.warning(f"PageRank did not converge within {max_iter} iterations")
+    return scores
+
+def split_sentences(text):
+    """
+    Normalise whitespace in a text and split it into sentences.
+    
+    Args:
+        text (str): The text to split
+    
+    Returns:
+        tuple: (preprocessed_text, sentences)
     """
     # Download NLTK resources if needed
     download_nltk_resources()
@@ -104,10 +364,18 @@ def generate_summary(text, num_sentences=5):
     # Tokenize the text into sentences
     sentences = sent_tokenize(preprocessed_text)
     
-    # If there are fewer sentences than requested, return the original text
-    if len(sentences) <= num_sentences:
-        return preprocessed_text
+    return preprocessed_text, sentences
+
+def score_sentences(sentences):
+    """
+    Score sentences with TextRank.
+    
+    Args:
+        sentences (list): List of sentence strings
     
+    Returns:
+        list: One score per sentence, in the order of the input
+    """
     # Get stop words
     stop_words = stopwords.words('english')
     
@@ -115,20 +383,311 @@ def generate_summary(text, num_sentences=5):
     sentence_tokens = [nltk.word_tokenize(sentence) for sentence in sentences]
     
     # Build the similarity matrix
-    similarity_matrix = build_similarity_matrix(sentence_tokens, stop_words)
+    similarity_matrix = build_sparse_similarity_matrix(
+        sentence_tokens, stop_words, top_k=config.SIMILARITY_TOP_K)
     
     # Rank sentences using PageRank algorithm
-    nx_graph = nx.from_numpy_array(similarity_matrix)
-    scores = nx.pagerank(nx_graph)
+    scores = pagerank(similarity_matrix,
+                      tol=config.PAGERANK_TOLERANCE,
+                      max_iter=config.PAGERANK_MAX_ITERATIONS)
+    
+    return scores.tolist()
+
+def select_summary(sentences, scores, num_sentences):
+    """
+    Build a summary from the highest scoring sentences.
+    
+    Args:
+        sentences (list): List of sentence strings
+        scores (list): One score per sentence
+        num_sentences (int): Number of sentences to include in the summary
     
+    Returns:
+        str: The selected sentences joined in their original order
+    """
     # Sort sentences by score and select top ones
-    ranked_sentences = sorted(((scores[i], i, s) for i, s in enumerate(sentences)), reverse=True)
+    ranked_sentences = sorted(((score, i) for i, score in enumerate(scores)), reverse=True)
     
     # Get the top N sentences based on their position in the original text
-    top_sentence_indices = sorted([ranked_sentences[i][1] for i in range(min(num_sentences, len(ranked_sentences)))])
-    summary = ' '.join([sentences[i] for i in top_sentence_indices])
+    top_sentence_indices = sorted(i for _, i in ranked_sentences[:num_sentences])
+    return ' '.join([sentences[i] for i in top_sentence_indices])
+
+def select_section_candidates(text, candidates_per_section, max_section_sentences):
+    """
+    Pick the best sentences of every section for hierarchical summarization.
+    
+    Each section is ranked on its own, in chunks of at most
+    max_section_sentences sentences, so memory is bounded by the largest
+    chunk rather than by the whole paper.
+    
+    Args:
+        text (str): Text as returned by pdf_extractor
+        candidates_per_section (int): Sentences kept from each chunk
+        max_section_sentences (int): Largest number of sentences ranked together
+    
+    Returns:
+        list: The winning sentences in document order
+    """
+    candidates = []
+    
+    for name, section_text in iter_sections(text):
+        _, sentences = split_sentences(section_text)
+        
+        for start in range(0, len(sentences), max_section_sentences):
+            chunk = sentences[start:start + max_section_sentences]
+            if len(chunk) <= candidates_per_section:
+                candidates.extend(chunk)
+                continue
+            
+            scores = score_sentences(chunk)
+            ranked = sorted(((score, i) for i, score in enumerate(scores)), reverse=True)
+            candidates.extend(chunk[i] for i in sorted(i for _, i in ranked[:candidates_per_section]))
     
-    return summary
+    return candidates
+
+def generate_summaries(text, sentence_counts, hierarchical=False):
+    """
+    Generate summaries of several lengths from a single TextRank pass.
+    
+    The text is tokenized and ranked once; each requested length is then a
+    cheap selection over the same scores. In hierarchical mode the paper is
+    first split into sections, the best sentences of each section are
+    selected, and only those winners are ranked against each other.
+    
+    Args:
+        text (str): The text to summarize
+        sentence_counts (iterable): Summary lengths, in sentences
+        hierarchical (bool): Rank section by section, dropping back matter
+    
+    Returns:
+        dict: Mapping of each requested length to its summary
+    """
+    sentence_counts = sorted(set(sentence_counts))
+    
+    if hierarchical:
+        sentences = select_section_candidates(
+            text, sentence_counts[-1], config.MAX_SECTION_SENTENCES)
+        preprocessed_text = ' '.join(sentences)
+    else:
+        preprocessed_text, sentences = split_sentences(text)
+    
+    # Lengths covering the whole text return it unchanged, without ranking
+    summaries = {count: preprocessed_text for count in sentence_counts if len(sentences) <= count}
+    
+    pending_counts = [count for count in sentence_counts if count not in summaries]
+    if pending_counts:
+        scores = score_sentences(sentences)
+        for count in pending_counts:
+            summaries[count] = select_summary(sentences, scores, count)
+    
+    return summaries
+
+def generate_summary(text, num_sentences=5):
+    """
+    Generate a summary of the given text using extractive summarization.
+    
+    Args:
+        text (str): The text to summarize
+        num_sentences (int): Number of sentences to include in the summary
+    
+    Returns:
+        str: The generated summary
+    """
+    return generate_summaries(text, [num_sentences])[num_sentences]
+
+def get_paper_job(conn, paper_id):
+    """
+    Load everything needed to summarize a paper, without holding the connection.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_id (int): The database ID of the paper
+    
+    Returns:
+        dict: The paper's ID, arXiv ID, PDF URL and abstract, or None if not found
+    """
+    cursor = conn.cursor()
+    
+    # Get paper details
+    cursor.execute("""
+    SELECT arxiv_id, pdf_url FROM papers WHERE id = ?
+    """, (paper_id,))
+    paper = cursor.fetchone()
+    
+    if not paper:
+        return None
+    
+    arxiv_id, pdf_url = paper
+    
+    # Get abstract
+    cursor.execute("SELECT abstract_text FROM abstracts WHERE paper_id = ?", (paper_id,))
+    abstract = cursor.fetchone()[0]
+    
+    return {
+        'paper_id': paper_id,
+        'arxiv_id': arxiv_id,
+        'pdf_url': pdf_url,
+        'abstract': abstract
+    }
+
+def resolve_full_text(job, full_text):
+    """
+    Fall back to the abstract when PDF extraction failed or came up short.
+    
+    Args:
+        job (dict): Paper details as returned by get_paper_job
+        full_text (str): Text extracted from the PDF, or None
+    
+    Returns:
+        tuple: (full_text, extraction_status)
+    """
+    abstract = job['abstract']
+    
+    # If PDF extraction fails, use abstract as fallback
+    if not full_text or len(full_text.strip()) < len(abstract):
+        logger.warning("PDF extraction failed or returned less text than the abstract. Using abstract as fallback.")
+        return abstract, "failed"
+    
+    logger.info(f"Successfully extracted {len(full_text)} characters from the PDF")
+    return full_text, "success"
+
+def summarize_full_text(job, full_text, extraction_status):
+    """
+    Summarize a paper's full text.
+    
+    Args:
+        job (dict): Paper details as returned by get_paper_job
+        full_text (str): The paper's full text
+        extraction_status (str): "success" or "failed"
+    
+    Returns:
+        dict: The job's paper_id and arxiv_id plus full_text,
+            extraction_status, content_hash, brief_summary,
+            extended_summary and summarizer_version
+    """
+    # Generate brief and extended summaries from a single ranking
+    logger.info(f"Generating summaries for {job['arxiv_id']}...")
+    hierarchical = len(full_text) >= config.HIERARCHICAL_MIN_CHARACTERS
+    summaries = generate_summaries(
+        full_text, [config.BRIEF_SUMMARY_SENTENCES, config.EXTENDED_SUMMARY_SENTENCES],
+        hierarchical=hierarchical)
+    
+    return {
+        'paper_id': job['paper_id'],
+        'arxiv_id': job['arxiv_id'],
+        'full_text': full_text,
+        'extraction_status': extraction_status,
+        'content_hash': fingerprint_text(full_text),
+        'brief_summary': summaries[config.BRIEF_SUMMARY_SENTENCES],
+        'extended_summary': summaries[config.EXTENDED_SUMMARY_SENTENCES],
+        'summarizer_version': get_summarizer_version()
+    }
+
+def summarize_paper(job):
+    """
+    Extract a paper's full text and summarize it.
+    
+    This does no database access, so it can run in a worker process.
+    
+    Args:
+        job (dict): Paper details as returned by get_paper_job
+    
+    Returns:
+        dict: Output of summarize_full_text
+    """
+    logger.info(f"Processing paper {job['arxiv_id']}")
+    
+    # Extract full text from PDF
+    logger.info(f"Extracting text from PDF: {job['pdf_url']}")
+    full_text, extraction_status = resolve_full_text(job, get_full_paper_text(job['pdf_url']))
+    
+    return summarize_full_text(job, full_text, extraction_status)
+
+def get_stored_text_job(conn, paper_id):
+    """
+    Load a paper together with its stored full text for re-summarization.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_id (int): The database ID of the paper
+    
+    Returns:
+        dict: get_paper_job's fields plus full_text (a text_store.StoredText)
+            and extraction_status, or None if the paper or its full text is missing
+    """
+    job = get_paper_job(conn, paper_id)
+    if not job:
+        return None
+    
+    stored = text_store.read_full_text(conn, paper_id)
+    if not stored:
+        return None
+    
+    # Still compressed; the summarizing process decompresses it
+    job['full_text'], job['extraction_status'] = stored
+    return job
+
+def resummarize_paper(job):
+    """
+    Summarize a paper's stored full text again, without touching the PDF.
+    
+    Args:
+        job (dict): Paper details as returned by get_stored_text_job
+    
+    Returns:
+        dict: Output of summarize_full_text
+    """
+    return summarize_full_text(job, job['full_text'].text, job['extraction_status'])
+
+def store_full_text(conn, result):
+    """Insert or update a paper's full text, compressed as configured. The caller commits."""
+    text_store.write_full_text(conn, result['paper_id'], result['full_text'],
+                               result['extraction_status'], result['content_hash'])
+    search.index_full_text(conn, result['paper_id'], result['full_text'])
+
+def store_summaries(conn, result):
+    """Insert or update a paper's summaries. The caller commits."""
+    conn.execute("""
+    INSERT INTO summaries (paper_id, brief_summary, extended_summary, summarizer_version, input_hash)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(paper_id) DO UPDATE SET
+        brief_summary = excluded.brief_summary,
+        extended_summary = excluded.extended_summary,
+        summarizer_version = excluded.summarizer_version,
+        input_hash = excluded.input_hash,
+        created_at = CURRENT_TIMESTAMP
+    """, (result['paper_id'], result['brief_summary'], result['extended_summary'],
+          result['summarizer_version'], result['content_hash']))
+    
+    # Keep the listing read model in step
+    conn.execute("""
+    UPDATE paper_listings SET brief_summary = ? WHERE paper_id = ?
+    """, (result['brief_summary'], result['paper_id']))
+
+def store_paper_results(conn, result):
+    """
+    Store a paper's full text and summaries. The caller commits.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        result (dict): Output of summarize_paper
+    """
+    store_full_text(conn, result)
+    store_summaries(conn, result)
+
+def store_refreshed_summaries(conn, result):
+    """
+    Store summaries regenerated from a paper's stored full text. The caller commits.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        result (dict): Output of resummarize_paper
+    """
+    # Rows written before fingerprints existed get their content hash now
+    conn.execute("""
+    UPDATE full_texts SET content_hash = ? WHERE paper_id = ? AND content_hash IS NULL
+    """, (result['content_hash'], result['paper_id']))
+    store_summaries(conn, result)
 
 def extract_and_summarize_paper(paper_id):
     """
@@ -136,85 +695,384 @@ def extract_and_summarize_paper(paper_id):
     
     Args:
         paper_id (int): The database ID of the paper
-        
+    
     Returns:
         bool: True if successful, False otherwise
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = db.acquire(DB_PATH)
     
     try:
-        # Get paper details
-        cursor.execute("""
-        SELECT arxiv_id, pdf_url FROM papers WHERE id = ?
-        """, (paper_id,))
-        paper = cursor.fetchone()
+        job = get_paper_job(conn, paper_id)
         
-        if not paper:
+        if not job:
             logger.error(f"Paper with ID {paper_id} not found")
             return False
         
-        arxiv_id, pdf_url = paper
-        
-        # Get abstract
-        cursor.execute("SELECT abstract_text FROM abstracts WHERE paper_id = ?", (paper_id,))
-        abstract = cursor.fetchone()[0]
-        
-        logger.info(f"Processing paper {arxiv_id}")
-        
-        # Extract full text from PDF
-        logger.info(f"Extracting text from PDF: {pdf_url}")
-        full_text = get_full_paper_text(pdf_url)
-        
-        # If PDF extraction fails, use abstract as fallback
-        if not full_text or len(full_text.strip()) < len(abstract):
-            logger.warning("PDF extraction failed or returned less text than the abstract. Using abstract as fallback.")
-            full_text = abstract
-            extraction_status = "failed"
-        else:
-            logger.info(f"Successfully extracted {len(full_text)} characters from the PDF")
-            extraction_status = "success"
-        
-        # Store full text
-        cursor.execute("""
-        INSERT INTO full_texts (paper_id, full_text, extraction_status)
-        VALUES (?, ?, ?)
-        """, (paper_id, full_text, extraction_status))
-        
-        # Generate brief summary (3 sentences)
-        logger.info("Generating brief summary...")
-        brief_summary = generate_summary(full_text, num_sentences=3)
-        
-        # Generate extended summary (10 sentences)
-        logger.info("Generating extended summary...")
-        extended_summary = generate_summary(full_text, num_sentences=10)
-        
-        # Store summaries
-        cursor.execute("""
-        INSERT INTO summaries (paper_id, brief_summary, extended_summary)
-        VALUES (?, ?, ?)
-        """, (paper_id, brief_summary, extended_summary))
+        result = summarize_paper(job)
+        store_paper_results(conn, result)
         
         conn.commit()
-        logger.info(f"Successfully processed and summarized paper {arxiv_id}")
+        logger.info(f"Successfully processed and summarized paper {result['arxiv_id']}")
         return True
-        
+    
     except Exception as e:
         conn.rollback()
         logger.error(f"Error processing paper {paper_id}: {str(e)}")
         return False
+    
+    finally:
+        db.release(conn)
+
+def init_summary_worker(workers):
+    """
+    Set up a summarization worker process.
+    
+    Args:
+        workers (int): Number of processes in the worker's pool
+    """
+    # Papers are already spread across the pool, so each worker extracts
+    # large PDFs with its share of the extraction processes, not all of them
+    config.PARALLEL_EXTRACTION_WORKERS = max(1, config.PARALLEL_EXTRACTION_WORKERS // workers)
+
+def download_stage(job):
+    """Pipeline stage: download a paper's PDF to disk, held until extract_stage deletes it."""
+    pdf_path, pdf_is_temporary = download_pdf_to_file(job['pdf_url'], hold=True)
+    return dict(job, pdf_path=pdf_path, pdf_is_temporary=pdf_is_temporary)
+
+def extract_stage(job):
+    """Pipeline stage: extract the downloaded PDF's text, run in a worker process."""
+    try:
+        full_text = extract_text_from_pdf_file(job['pdf_path']) if job['pdf_path'] else None
+    finally:
+        if job['pdf_is_temporary']:
+            os.remove(job['pdf_path'])
+    
+    full_text, extraction_status = resolve_full_text(job, full_text)
+    return dict(job, full_text=full_text, extraction_status=extraction_status)
+
+def summarize_stage(job):
+    """Pipeline stage: summarize the extracted text, run in a worker process."""
+    return summarize_full_text(job, job['full_text'], job['extraction_status'])
+
+def summarize_downloaded_paper(job):
+    """Extract and summarize a paper whose PDF download_stage fetched, in a worker process."""
+    return summarize_stage(extract_stage(job))
+
+def process_papers_in_parallel(paper_ids, workers, load_job=get_paper_job, prepare=download_stage,
+                               summarize=summarize_downloaded_paper, store=store_paper_results):
+    """
+    Summarize papers in a process pool and store the results.
+    
+    Worker processes only extract and summarize; this process is the single
+    writer and commits each paper as soon as its result arrives. PDFs are
+    downloaded here on threads, so the per-host concurrency limit and rate
+    limiter are shared by every worker instead of multiplied by them.
+    
+    Args:
+        paper_ids (list): Database IDs of the papers to process
+        workers (int): Number of worker processes
+        load_job (callable): Loads a paper's job from the database
+        prepare (callable): Readies a job in this process before it is
+            summarized, e.g. by downloading its PDF; None to skip
+        summarize (callable): Turns a job into a result, in a worker process
+        store (callable): Writes a result to the database
+    
+    Returns:
+        int: Number of papers processed successfully
+    """
+    conn = db.acquire(DB_PATH)
+    
+    def iter_jobs():
+        for paper_id in paper_ids:
+            try:
+                job = load_job(conn, paper_id)
+            except Exception as e:
+                logger.error(f"Error loading paper {paper_id}: {str(e)}")
+                continue
+            if not job:
+                logger.error(f"Paper with ID {paper_id} not found")
+                continue
+            yield job
+    
+    try:
+        logger.info(f"Summarizing {len(paper_ids)} papers with {workers} worker processes")
+        
+        jobs = iter_jobs()
+        prepared = {}
+        futures = {}
         
+        processed_count = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_summary_worker,
+                                 initargs=(workers,)) as executor, \
+                ThreadPoolExecutor(max_workers=config.PDF_DOWNLOAD_WORKERS) as downloader:
+            def submit_next_job():
+                job = next(jobs, None)
+                if job is None:
+                    return
+                if prepare is None:
+                    futures[executor.submit(summarize, job)] = job
+                else:
+                    prepared[downloader.submit(prepare, job)] = job
+            
+            # The pool forks all its workers on the first submit; doing that
+            # before any download thread starts keeps a child from inheriting
+            # a lock one of them was holding, which would hang it
+            executor.submit(os.getpid)
+            
+            # Only a few papers per worker are in flight, so downloaded PDFs
+            # and loaded texts do not pile up while the summarizers fall behind
+            for _ in range(workers * config.PROCESSING_PREFETCH):
+                submit_next_job()
+            
+            # Results are stored while later PDFs are still downloading
+            while futures or prepared:
+                done, _ = wait(list(futures) + list(prepared), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in prepared:
+                        paper_id = prepared.pop(future)['paper_id']
+                        try:
+                            job = future.result()
+                            futures[executor.submit(summarize, job)] = job
+                        except Exception as e:
+                            logger.error(f"Error processing paper {paper_id}: {str(e)}")
+                            submit_next_job()
+                        continue
+                    
+                    paper_id = futures.pop(future)['paper_id']
+                    try:
+                        result = future.result()
+                        store(conn, result)
+                        conn.commit()
+                        logger.info(f"Successfully processed and summarized paper {result['arxiv_id']}")
+                        processed_count += 1
+                    except Exception as e:
+                        conn.rollback()
+                        logger.error(f"Error processing paper {paper_id}: {str(e)}")
+                    submit_next_job()
+        
+        return processed_count
+    
+    finally:
+        db.release(conn)
+
+def process_papers_pipelined(paper_ids):
+    """
+    Process papers through a download -> extract -> summarize -> store pipeline.
+    
+    Downloads run on threads while extraction and summarization share a
+    process pool, so the network and CPUs stay busy at the same time.
+    Bounded queues between the stages provide backpressure, and a single
+    storage thread writes results to SQLite.
+    
+    Args:
+        paper_ids (list): Database IDs of the papers to process
+    
+    Returns:
+        int: Number of papers processed successfully
+    """
+    conn = db.acquire(DB_PATH)
+    # Only the storage stage's single thread writes through this connection
+    store_conn = db.acquire(DB_PATH)
+    
+    def iter_jobs():
+        for paper_id in paper_ids:
+            try:
+                job = get_paper_job(conn, paper_id)
+            except Exception as e:
+                logger.error(f"Error loading paper {paper_id}: {str(e)}")
+                continue
+            if not job:
+                logger.error(f"Paper with ID {paper_id} not found")
+                continue
+            yield job
+    
+    def store_stage(result):
+        try:
+            store_paper_results(store_conn, result)
+            store_conn.commit()
+        except Exception:
+            store_conn.rollback()
+            raise
+        logger.info(f"Successfully processed and summarized paper {result['arxiv_id']}")
+        return result['paper_id']
+    
+    try:
+        with ProcessPoolExecutor(max_workers=config.PROCESSING_WORKERS, initializer=init_summary_worker,
+                                 initargs=(config.PROCESSING_WORKERS,)) as executor:
+            def in_worker_process(func):
+                return lambda job: executor.submit(func, job).result()
+            
+            processing_pipeline = Pipeline([
+                Stage('download', download_stage, config.PIPELINE_DOWNLOAD_WORKERS),
+                Stage('extract', in_worker_process(extract_stage), config.PIPELINE_EXTRACT_WORKERS),
+                Stage('summarize', in_worker_process(summarize_stage), config.PIPELINE_SUMMARIZE_WORKERS),
+                Stage('store', store_stage, 1)
+            ], queue_size=config.PIPELINE_QUEUE_SIZE, metrics_interval=config.PIPELINE_METRICS_INTERVAL)
+            
+            return processing_pipeline.run(iter_jobs())
+    
     finally:
-        conn.close()
+        db.release(conn)
+        db.release(store_conn)
+
+def process_papers(paper_ids, workers=None, pipelined=None):
+    """
+    Extract, summarize and store the given papers.
+    
+    Args:
+        paper_ids (list): Database IDs of the papers to process
+        workers (int): Number of worker processes to summarize with; defaults
+            to config.PROCESSING_WORKERS. With 1 worker papers are processed
+            serially in this process.
+        pipelined (bool): Use the staged download/extract/summarize/store
+            pipeline; defaults to config.PIPELINED_PROCESSING
+    
+    Returns:
+        int: Number of papers processed successfully
+    """
+    if workers is None:
+        workers = config.PROCESSING_WORKERS
+    if pipelined is None:
+        pipelined = config.PIPELINED_PROCESSING
+    
+    if pipelined:
+        return process_papers_pipelined(paper_ids)
+    
+    if workers > 1 and len(paper_ids) > 1:
+        return process_papers_in_parallel(paper_ids, min(workers, len(paper_ids)))
+    
+    # Process each paper
+    processed_count = 0
+    for paper_id in paper_ids:
+        success = extract_and_summarize_paper(paper_id)
+        if success:
+            processed_count += 1
+    return processed_count
 
-def process_unprocessed_papers():
+def resummarize_papers(paper_ids, workers=None):
+    """
+    Regenerate summaries from the papers' stored full texts.
+    
+    Args:
+        paper_ids (list): Database IDs of the papers to re-summarize
+        workers (int): Number of worker processes; defaults to
+            config.PROCESSING_WORKERS
+    
+    Returns:
+        int: Number of papers re-summarized successfully
+    """
+    if workers is None:
+        workers = config.PROCESSING_WORKERS
+    
+    if workers > 1 and len(paper_ids) > 1:
+        return process_papers_in_parallel(
+            paper_ids, min(workers, len(paper_ids)), load_job=get_stored_text_job, prepare=None,
+            summarize=resummarize_paper, store=store_refreshed_summaries)
+    
+    conn = db.acquire(DB_PATH)
+    processed_count = 0
+    
+    try:
+        for paper_id in paper_ids:
+            try:
+                job = get_stored_text_job(conn, paper_id)
+                if not job:
+                    logger.error(f"Paper with ID {paper_id} or its full text not found")
+                    continue
+                store_refreshed_summaries(conn, resummarize_paper(job))
+                conn.commit()
+                processed_count += 1
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error re-summarizing paper {paper_id}: {str(e)}")
+        
+        return processed_count
+    
+    finally:
+        db.release(conn)
+
+def find_stale_papers(conn):
+    """
+    Find papers whose stored results are missing or out of date.
+    
+    A paper without a stored full text needs the whole extract-and-summarize
+    treatment. A paper whose summaries were produced by another summarizer
+    version, or from a text whose content hash no longer matches the stored
+    full text, only needs its stored text summarized again.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+    
+    Returns:
+        tuple: (IDs of papers to extract, IDs of papers to re-summarize)
+    """
+    rows = conn.execute("""
+    SELECT p.id, ft.paper_id IS NOT NULL AS has_full_text
+    FROM papers p
+    LEFT JOIN full_texts ft ON p.id = ft.paper_id
+    LEFT JOIN summaries s ON p.id = s.paper_id
+    WHERE ft.paper_id IS NULL
+       OR s.paper_id IS NULL
+       OR ft.content_hash IS NULL
+       OR s.summarizer_version IS NOT ?
+       OR s.input_hash IS NOT ft.content_hash
+    """, (get_summarizer_version(),)).fetchall()
+    
+    to_extract = [paper_id for paper_id, has_full_text in rows if not has_full_text]
+    to_resummarize = [paper_id for paper_id, has_full_text in rows if has_full_text]
+    return to_extract, to_resummarize
+
+def process_stale_papers(workers=None, pipelined=None):
+    """
+    Bring every paper's full text and summaries up to date, doing only the work that changed.
+    
+    Args:
+        workers (int): Number of worker processes
+        pipelined (bool): Use the staged pipeline for papers that need extraction
+    
+    Returns:
+        int: Number of papers processed or re-summarized
+    """
+    conn = db.acquire(DB_PATH)
+    
+    try:
+        to_extract, to_resummarize = find_stale_papers(conn)
+    except Exception as e:
+        logger.error(f"Error finding stale papers: {str(e)}")
+        return 0
+    finally:
+        db.release(conn)
+    
+    if not to_extract and not to_resummarize:
+        logger.info("All papers are up to date")
+        return 0
+    
+    logger.info(f"Found {len(to_extract)} papers to extract and {len(to_resummarize)} to re-summarize")
+    
+    processed_count = 0
+    if to_extract:
+        processed_count += process_papers(to_extract, workers, pipelined)
+    if to_resummarize:
+        processed_count += resummarize_papers(to_resummarize, workers)
+    
+    logger.info(f"Successfully brought {processed_count} papers up to date")
+    return processed_count
+
+def process_unprocessed_papers(workers=None, pipelined=None):
     """
     Find papers that have been retrieved but not yet summarized and process them.
     
+    Args:
+        workers (int): Number of worker processes to summarize with; defaults
+            to config.PROCESSING_WORKERS. With 1 worker papers are processed
+            serially in this process.
+        pipelined (bool): Use the staged download/extract/summarize/store
+            pipeline; defaults to config.PIPELINED_PROCESSING
+    
     Returns:
         int: Number of papers processed
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.acquire(DB_PATH)
     cursor = conn.cursor()
     
     try:
@@ -233,23 +1091,17 @@ def process_unprocessed_papers():
         
         logger.info(f"Found {len(unprocessed_papers)} unprocessed papers")
         
-        # Process each paper
-        processed_count = 0
-        for paper in unprocessed_papers:
-            paper_id = paper[0]
-            success = extract_and_summarize_paper(paper_id)
-            if success:
-                processed_count += 1
+        processed_count = process_papers([paper[0] for paper in unprocessed_papers], workers, pipelined)
         
         logger.info(f"Successfully processed {processed_count} papers")
         return processed_count
-        
+    
     except Exception as e:
         logger.error(f"Error processing unprocessed papers: {str(e)}")
         return 0
-        
+    
     finally:
-        conn.close()
+        db.release(conn)
 
 if __name__ == "__main__":
     logger.info("Starting paper processing and summarization")
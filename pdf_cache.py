@@ -0,0 +1,335 @@
+"""
+Persistent on-disk cache for downloaded arXiv PDFs.
+
+PDFs are stored content-addressed (by SHA-256) under the cache directory and
+looked up by arXiv ID and version. A small SQLite index records each entry's
+checksum, size, modification time and last access time, which drive integrity
+checks and least-recently-used eviction once the cache exceeds its byte budget.
+"""
+
+import os
+import re
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import config
+
+logger = logging.getLogger(__name__)
+
+# arXiv IDs in abs/pdf URLs, new style (2101.00123v1) or old style (quant-ph/0101001v2)
+ARXIV_URL_PATTERN = re.compile(r'/(?:abs|pdf)/(?P<arxiv_id>.+?)(?:\.pdf)?/?$')
+ARXIV_HOSTS = ('arxiv.org', 'www.arxiv.org', 'export.arxiv.org')
+
+def cache_key_for_url(url):
+    """
+    Get the cache key for a PDF URL.
+    
+    Args:
+        url (str): arXiv PDF or abstract URL, or any other PDF URL
+    
+    Returns:
+        str: The arXiv ID plus version for arXiv URLs, e.g. '2101.00123v1',
+            so mirrors of the same paper share an entry; otherwise 'url-'
+            and the SHA-256 of the whole URL
+    """
+    parts = urlsplit(url)
+    match = ARXIV_URL_PATTERN.search(parts.path)
+    if match and (parts.hostname or '').lower() in ARXIV_HOSTS:
+        return match.group('arxiv_id')
+    return 'url-' + hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+class PDFCache:
+    """Size-bounded, content-addressed PDF cache with LRU eviction."""
+    
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corrupt = 0
+        self._lock = threading.Lock()
+        self._hold_ids = itertools.count()
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, 'index.db')
+        with self._connect() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                cache_key TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                mtime REAL
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+            # Indexes from before modification times were recorded are verified on first use
+            columns = [column[1] for column in conn.execute("PRAGMA table_info(entries)")]
+            if 'mtime' not in columns:
+                conn.execute("ALTER TABLE entries ADD COLUMN mtime REAL")
+    
+    @contextmanager
+    def _connect(self):
+        # The index is shared by every worker process using the cache directory
+        conn = sqlite3.connect(self._index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _blob_path(self, sha256):
+        return os.path.join(self.cache_dir, sha256[:2], sha256 + '.pdf')
+    
+    def get_path(self, key, verify=False):
+        """
+        Look up a cached PDF and check its integrity.
+        
+        A file whose size and modification time match the index is trusted;
+        its checksum is only recomputed when they differ or when asked to.
+        
+        Args:
+            key (str): Cache key from cache_key_for_url
+            verify (bool): Recompute the checksum even if the file looks unchanged
+        
+        Returns:
+            str: Path of the cached file, or None on a miss
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT sha256, size, mtime FROM entries WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+        
+        # Hashing a large file must not hold up other lookups
+        sha256, size, mtime = row
+        path = self._blob_path(sha256)
+        current_mtime = self._check_file(path, sha256, size, None if verify else mtime)
+        
+        with self._lock, self._connect() as conn:
+            if current_mtime is None:
+                logger.warning(f"Cached PDF for {key} failed its integrity check; discarding it")
+                self.corrupt += 1
+                self.misses += 1
+                self._remove_entry(conn, key, sha256)
+                return None
+            
+            conn.execute("UPDATE entries SET last_access = ?, mtime = ? WHERE cache_key = ? AND sha256 = ?",
+                         (time.time(), current_mtime, key, sha256))
+            self.hits += 1
+            return path
+    
+    def get(self, key):
+        """
+        Get a cached PDF's content.
+        
+        Args:
+            key (str): Cache key from cache_key_for_url
+        
+        Returns:
+            bytes: The PDF content, or None on a miss
+        """
+        path = self.get_path(key)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    def put(self, key, content):
+        """
+        Add a PDF to the cache, evicting least recently used entries if needed.
+        
+        Args:
+            key (str): Cache key from cache_key_for_url
+            content (bytes): The PDF content
+        
+        Returns:
+            str: Path of the cached file
+        
+        Raises:
+            ValueError: If the PDF is larger than the whole cache budget
+        """
+        self._check_fits(key, len(content))
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(sha256)
+        
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write under a unique name and rename so readers never see partial files
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        
+        self._add_entry(key, sha256, len(content), path)
+        return path
+    
+    def put_file(self, key, path, keep=False):
+        """
+        Move a downloaded PDF file into the cache.
+        
+        The file is renamed (or linked) into place, so it should live on the
+        same filesystem as the cache directory.
+        
+        Args:
+            key (str): Cache key from cache_key_for_url
+            path (str): Path of the downloaded file; it is consumed unless keep is set
+            keep (bool): Leave the file in place for the caller, linking the
+                cached copy to it, so eviction cannot remove it while in use
+        
+        Returns:
+            str: Path of the cached file
+        
+        Raises:
+            ValueError: If the PDF is larger than the whole cache budget; the
+                file is then left where it is
+        """
+        size = os.path.getsize(path)
+        self._check_fits(key, size)
+        sha256 = self._file_digest(path)
+        cached_path = self._blob_path(sha256)
+        
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        if os.path.exists(cached_path):
+            if not keep:
+                os.remove(path)
+        elif keep:
+            self._link(path, cached_path)
+        else:
+            os.replace(path, cached_path)
+        
+        self._add_entry(key, sha256, size, cached_path)
+        return cached_path
+    
+    def hold(self, path):
+        """
+        Link a cached file under a private name while it is in use.
+        
+        Eviction only removes the cache's own name for the file, so the
+        held copy stays readable until the caller deletes it.
+        
+        Args:
+            path (str): Path returned by get_path
+        
+        Returns:
+            str: Path of the held copy, or None if the file was evicted first
+        """
+        held_path = f"{path}.{os.getpid()}.{next(self._hold_ids)}.held"
+        try:
+            self._link(path, held_path)
+        except FileNotFoundError:
+            return None
+        return held_path
+    
+    def _link(self, path, link_path):
+        try:
+            os.link(path, link_path)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # Filesystems without hard links get a copy
+            shutil.copyfile(path, link_path)
+    
+    def _check_fits(self, key, size):
+        # Caching it would evict every other entry and then the file itself
+        if size > self.max_bytes:
+            raise ValueError(f"PDF for {key} is {size} bytes, more than the cache's {self.max_bytes}")
+    
+    def _add_entry(self, key, sha256, size, path):
+        mtime = os.stat(path).st_mtime
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+            INSERT OR REPLACE INTO entries (cache_key, sha256, size, last_access, mtime)
+            VALUES (?, ?, ?, ?, ?)
+            """, (key, sha256, size, time.time(), mtime))
+            self._evict(conn, keep=key)
+    
+    def _file_digest(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _check_file(self, path, sha256, size, mtime):
+        # The file's modification time if it is intact, else None
+        try:
+            stat = os.stat(path)
+            if stat.st_size != size:
+                return None
+            if stat.st_mtime == mtime or self._file_digest(path) == sha256:
+                return stat.st_mtime
+            return None
+        except OSError:
+            return None
+    
+    def _remove_entry(self, conn, key, sha256):
+        # Another thread may have replaced the entry since it was read
+        conn.execute("DELETE FROM entries WHERE cache_key = ? AND sha256 = ?", (key, sha256))
+        # Identical PDFs under several keys share one file
+        still_used = conn.execute("SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        if not still_used:
+            try:
+                os.remove(self._blob_path(sha256))
+            except FileNotFoundError:
+                pass
+    
+    def _evict(self, conn, keep):
+        total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        
+        # The entry just added is never evicted to make room for itself
+        for key, sha256, size in conn.execute(
+                "SELECT cache_key, sha256, size FROM entries WHERE cache_key != ? ORDER BY last_access",
+                (keep,)).fetchall():
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove_entry(conn, key, sha256)
+            total_bytes -= size
+            self.evictions += 1
+            logger.info(f"Evicted {key} from the PDF cache")
+    
+    def stats(self):
+        """
+        Get cache counters and current usage.
+        
+        Returns:
+            dict: hits, misses, evictions, corrupt, entries and bytes
+        """
+        with self._connect() as conn:
+            entries, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'corrupt': self.corrupt,
+            'entries': entries,
+            'bytes': total_bytes
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_pdf_cache():
+    """
+    Get the process-wide PDF cache configured in config.py.
+    
+    Returns:
+        PDFCache: The shared cache, or None if caching is disabled
+    """
+    global _cache
+    if not config.PDF_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PDFCache(config.PDF_CACHE_DIR, config.PDF_CACHE_MAX_BYTES)
+        return _cache
@@ -1,7 +1,16 @@
 import requests
+from requests.adapters import HTTPAdapter
 import PyPDF2
 import io
+import os
 import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+import config
+from pdf_cache import cache_key_for_url, get_pdf_cache
 
 # Set up logging
 logging.basicConfig(
@@ -14,44 +23,272 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def download_pdf(url):
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+class HostRateLimiter:
+    """Space out request starts to the same host by a minimum interval."""
+    
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_start = {}
+        self._lock = threading.Lock()
+    
+    def wait(self, host):
+        """Block until a request to host may start."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.min_interval
+        
+        if start > now:
+            time.sleep(start - now)
+
+class HostConcurrencyLimiter:
+    """Bound the number of requests in flight to the same host."""
+    
+    def __init__(self, per_host_limit):
+        self.per_host_limit = per_host_limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+    
+    def slot(self, host):
+        """Return the semaphore guarding requests to host."""
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._semaphores[host]
+
+_session = None
+_session_lock = threading.Lock()
+_rate_limiter = HostRateLimiter(config.PDF_DOWNLOAD_MIN_INTERVAL)
+_host_limiter = HostConcurrencyLimiter(config.PDF_DOWNLOAD_PER_HOST_LIMIT)
+
+def get_session():
+    """
+    Get the shared keep-alive HTTP session used for PDF downloads.
+    
+    Returns:
+        requests.Session: Session with a connection pool sized for concurrent downloads
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=config.PDF_DOWNLOAD_WORKERS,
+                                  pool_maxsize=config.PDF_DOWNLOAD_WORKERS)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+def download_pdf(url, session=None):
     """
     Download a PDF file from a URL.
     
+    arXiv PDFs are served from the on-disk PDF cache when present. Otherwise
+    requests go through a shared keep-alive session and respect the per-host
+    concurrency limit and politeness interval from config.
+    
     Args:
         url (str): URL of the PDF file
+        session (requests.Session): Session to use instead of the shared one
         
     Returns:
         bytes: The PDF file content as bytes, or None if download fails
     """
+    cache = get_pdf_cache()
+    cache_key = cache_key_for_url(url) if cache else None
+    if cache_key:
+        content = cache.get(cache_key)
+        if content is not None:
+            logger.info(f"Using cached PDF for {cache_key}")
+            return content
+    
+    if session is None:
+        session = get_session()
+    host = urlsplit(url).netloc
+    
     try:
-        logger.info(f"Downloading PDF from {url}")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        return response.content
+        with _host_limiter.slot(host):
+            _rate_limiter.wait(host)
+            logger.info(f"Downloading PDF from {url}")
+            response = session.get(url, timeout=30)
+            response.raise_for_status()  # Raise an exception for HTTP errors
+            content = response.content
     except Exception as e:
         logger.error(f"Error downloading PDF: {str(e)}")
         return None
+    
+    # Only cache real PDFs, not error pages served with a 200 status
+    if cache_key and content.startswith(b'%PDF'):
+        try:
+            cache.put(cache_key, content)
+        except Exception as e:
+            logger.warning(f"Could not cache PDF for {cache_key}: {str(e)}")
+    
+    return content
+
+def download_pdf_to_file(url, session=None, hold=False):
+    """
+    Download a PDF to disk without holding it in memory.
+    
+    The response body is streamed in chunks to a temporary file. arXiv PDFs
+    are served from, and stored in, the on-disk PDF cache when it is enabled.
+    
+    Args:
+        url (str): URL of the PDF file
+        session (requests.Session): Session to use instead of the shared one
+        hold (bool): Always return a temporary file, linked to the cached copy,
+            so the cache cannot evict the PDF before the caller has read it
+        
+    Returns:
+        tuple: (path, is_temporary), or (None, False) if download fails.
+            Temporary files must be deleted by the caller.
+    """
+    cache = get_pdf_cache()
+    cache_key = cache_key_for_url(url) if cache else None
+    if cache_key:
+        path = cache.get_path(cache_key)
+        if path is not None and hold:
+            path = cache.hold(path)
+        if path is not None:
+            logger.info(f"Using cached PDF for {cache_key}")
+            return path, hold
+    
+    if session is None:
+        session = get_session()
+    host = urlsplit(url).netloc
+    
+    # Download next to the cache so the finished file can be moved into it
+    fd, temp_path = tempfile.mkstemp(suffix='.pdf', dir=cache.cache_dir if cache_key else None)
+    try:
+        with os.fdopen(fd, 'wb') as f, _host_limiter.slot(host):
+            _rate_limiter.wait(host)
+            logger.info(f"Downloading PDF from {url}")
+            with session.get(url, timeout=30, stream=True) as response:
+                response.raise_for_status()  # Raise an exception for HTTP errors
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+    except Exception as e:
+        logger.error(f"Error downloading PDF: {str(e)}")
+        os.remove(temp_path)
+        return None, False
+    
+    if cache_key and is_pdf_file(temp_path):
+        try:
+            cached_path = cache.put_file(cache_key, temp_path, keep=hold)
+            return (temp_path, True) if hold else (cached_path, False)
+        except Exception as e:
+            logger.warning(f"Could not cache PDF for {cache_key}: {str(e)}")
+    
+    return temp_path, True
+
+def is_pdf_file(path):
+    """Check whether a file starts with the PDF magic number."""
+    with open(path, 'rb') as f:
+        return f.read(4) == b'%PDF'
+
+def iter_pdf_pages(pdf_file):
+    """
+    Extract text from a PDF one page at a time.
+    
+    Only the extracted text is streamed: the PDF is read from the file
+    rather than loaded into memory, but PyPDF2 keeps every object it has
+    resolved, so parsed pages accumulate until the reader is closed.
+    
+    Args:
+        pdf_file: Path of a PDF file, or a binary file object
+    
+    Yields:
+        str: The text of each page, in order
+    """
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, 'rb') as f:
+            yield from iter_pdf_pages(f)
+        return
+    
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    for page in pdf_reader.pages:
+        yield page.extract_text() + "\n"
 
 def extract_text_from_pdf(pdf_content):
     """
     Extract text from a PDF file.
     
     Args:
-        pdf_content (bytes): PDF file content as bytes
+        pdf_content: PDF file content as bytes, or the path of a PDF file
         
     Returns:
         str: Extracted text from the PDF, or None if extraction fails
     """
     try:
         logger.info("Extracting text from PDF content")
-        pdf_file = io.BytesIO(pdf_content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        if isinstance(pdf_content, bytes):
+            pdf_content = io.BytesIO(pdf_content)
         
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() + "\n"
+        text = "".join(iter_pdf_pages(pdf_content))
+        
+        if not text.strip():
+            logger.warning("No text extracted from PDF")
+            return None
+        
+        logger.info(f"Successfully extracted {len(text)} characters from PDF")
+        return text
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF: {str(e)}")
+        return None
+
+def extract_page_range(path, start, stop):
+    """
+    Extract the text of a range of pages from a PDF file.
+        
+    Args:
+        path (str): Path of the PDF file
+        start (int): Index of the first page
+        stop (int): Index one past the last page
+    
+    Returns:
+        list: The text of each page in the range, in order
+    """
+    with open(path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        return [pdf_reader.pages[i].extract_text() + "\n" for i in range(start, stop)]
+
+def extract_text_from_pdf_file(path, workers=None):
+    """
+    Extract text from a PDF file, splitting large PDFs across processes.
+    
+    PDFs with at least config.PARALLEL_EXTRACTION_MIN_PAGES pages are cut
+    into contiguous page ranges that are extracted in a process pool and
+    reassembled in order. Smaller PDFs are extracted in this process to
+    avoid the pool overhead.
+    
+    Args:
+        path (str): Path of the PDF file
+        workers (int): Number of processes; defaults to
+            config.PARALLEL_EXTRACTION_WORKERS
+        
+    Returns:
+        str: Extracted text from the PDF, or None if extraction fails
+    """
+    if workers is None:
+        workers = config.PARALLEL_EXTRACTION_WORKERS
+    
+    try:
+        with open(path, 'rb') as f:
+            page_count = len(PyPDF2.PdfReader(f).pages)
+        
+        if workers <= 1 or page_count < config.PARALLEL_EXTRACTION_MIN_PAGES:
+            text = "".join(iter_pdf_pages(path))
+        else:
+            logger.info(f"Extracting {page_count} pages with {workers} processes")
+            # A few ranges per worker evens out pages of uneven complexity
+            range_size = max(1, -(-page_count // (workers * 4)))
+            starts = range(0, page_count, range_size)
+            stops = [min(start + range_size, page_count) for start in starts]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                page_ranges = executor.map(extract_page_range, [path] * len(stops), starts, stops)
+                text = "".join(page_text for page_range in page_ranges for page_text in page_range)
         
         if not text.strip():
             logger.warning("No text extracted from PDF")
@@ -74,13 +311,16 @@ def get_full_paper_text(pdf_url):
         str: Extracted text from the PDF, or None if download or extraction fails
     """
     # Download the PDF
-    pdf_content = download_pdf(pdf_url)
-    if not pdf_content:
+    path, is_temporary = download_pdf_to_file(pdf_url)
+    if path is None:
         return None
     
     # Extract text from the PDF
-    text = extract_text_from_pdf(pdf_content)
-    return text
+    try:
+        return extract_text_from_pdf_file(path)
+    finally:
+        if is_temporary:
+            os.remove(path)
 
 if __name__ == "__main__":
     # Test with a sample arXiv PDF
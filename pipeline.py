@@ -0,0 +1,181 @@
+"""
+Staged processing pipeline with bounded queues between stages.
+
+Each stage runs its function on a fixed number of worker threads and passes
+results to the next stage through a bounded queue, so a slow stage applies
+backpressure to the stages feeding it instead of letting work pile up in
+memory. CPU-bound stages can hand their work to a process pool from these
+threads, which keeps the GIL out of the way.
+"""
+
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's input
+_STOP = object()
+
+class Stage:
+    """A named pipeline step run by a fixed number of worker threads."""
+    
+    def __init__(self, name, func, workers=1):
+        """
+        Args:
+            name (str): Stage name used in logs and metrics
+            func (callable): Called with each item; its return value is passed
+                to the next stage, and None drops the item
+            workers (int): Number of items processed concurrently
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.input_queue = None
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self._live_workers = 0
+        self._lock = threading.Lock()
+    
+    def metrics(self):
+        """
+        Get the stage's counters.
+        
+        Returns:
+            dict: workers, queue_depth, max_queue_depth, processed, failed
+                and busy_seconds
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_depth': self.input_queue.qsize() if self.input_queue else 0,
+                'max_queue_depth': self.max_queue_depth,
+                'processed': self.processed,
+                'failed': self.failed,
+                'busy_seconds': round(self.busy_seconds, 3)
+            }
+
+class Pipeline:
+    """A chain of stages connected by bounded queues."""
+    
+    def __init__(self, stages, queue_size=8, metrics_interval=None):
+        """
+        Args:
+            stages (list): Stage objects, in processing order
+            queue_size (int): Capacity of the queue in front of each stage
+            metrics_interval (float): If set, log stage metrics this often
+                (in seconds) while the pipeline runs
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics_interval = metrics_interval
+        self.completed = 0
+        self._lock = threading.Lock()
+    
+    def run(self, items):
+        """
+        Push items through every stage and wait for the pipeline to drain.
+        
+        Feeding blocks while the first stage's queue is full, so items may be
+        produced lazily by a generator.
+        
+        Args:
+            items (iterable): Inputs of the first stage
+        
+        Returns:
+            int: Number of items that made it through the last stage
+        """
+        self.completed = 0
+        for stage in self.stages:
+            stage.input_queue = queue.Queue(maxsize=self.queue_size)
+            stage._live_workers = stage.workers
+        
+        threads = []
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for worker in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage, next_stage),
+                                          name=f"{stage.name}-{worker}", daemon=True)
+                thread.start()
+                threads.append(thread)
+        
+        stop_monitor = threading.Event()
+        if self.metrics_interval:
+            threading.Thread(target=self._monitor, args=(stop_monitor,), daemon=True).start()
+        
+        try:
+            first_stage = self.stages[0]
+            for item in items:
+                first_stage.input_queue.put(item)
+            for _ in range(first_stage.workers):
+                first_stage.input_queue.put(_STOP)
+            
+            for thread in threads:
+                thread.join()
+        finally:
+            stop_monitor.set()
+        
+        self.log_metrics()
+        return self.completed
+    
+    def _work(self, stage, next_stage):
+        while True:
+            item = stage.input_queue.get()
+            if item is _STOP:
+                break
+            
+            with stage._lock:
+                stage.max_queue_depth = max(stage.max_queue_depth, stage.input_queue.qsize() + 1)
+            
+            started = time.perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                logger.error(f"Error in pipeline stage {stage.name}: {str(e)}")
+                result = None
+                with stage._lock:
+                    stage.failed += 1
+            else:
+                with stage._lock:
+                    stage.processed += 1
+            finally:
+                with stage._lock:
+                    stage.busy_seconds += time.perf_counter() - started
+            
+            if result is None:
+                continue
+            if next_stage is not None:
+                next_stage.input_queue.put(result)
+            else:
+                with self._lock:
+                    self.completed += 1
+        
+        # The last worker out closes the next stage's input
+        with stage._lock:
+            stage._live_workers -= 1
+            last_worker = stage._live_workers == 0
+        if last_worker and next_stage is not None:
+            for _ in range(next_stage.workers):
+                next_stage.input_queue.put(_STOP)
+    
+    def _monitor(self, stop):
+        while not stop.wait(self.metrics_interval):
+            self.log_metrics()
+    
+    def metrics(self):
+        """
+        Get every stage's metrics.
+        
+        Returns:
+            dict: Stage name to that stage's metrics
+        """
+        return {stage.name: stage.metrics() for stage in self.stages}
+    
+    def log_metrics(self):
+        """Log one line of metrics per stage."""
+        for name, metrics in self.metrics().items():
+            logger.info(f"Pipeline stage {name}: " +
+                        ", ".join(f"{key}={value}" for key, value in metrics.items()))
@@ -0,0 +1,430 @@
+"""
+Related papers from TF-IDF similarity of abstracts and summaries.
+
+A batch job vectorizes every paper's abstract and extended summary, then
+finds each paper's nearest neighbours by cosine similarity, computed as
+sparse matrix products over blocks of papers so memory stays bounded. The
+neighbours are stored in the related_papers table, where a page reads them
+with one primary key lookup.
+
+Runs are incremental: triggers on the abstracts and summaries tables mark
+papers whose text is new or changed as dirty, and only those get their
+neighbours recomputed; a run with nothing dirty returns without reading any
+text. Their similarities to every other paper are also merged into the other
+papers' neighbour lists, so existing papers pick up new related work without
+being recomputed. An existing paper is only recomputed itself when a changed
+paper it lists has become less similar than the rest of its list, since
+another paper may now belong there.
+"""
+
+import re
+import time
+import argparse
+import logging
+from array import array
+from collections import Counter
+import numpy as np
+from scipy import sparse
+import config
+import db
+
+logger = logging.getLogger(__name__)
+
+# Database setup
+DB_PATH = config.DB_PATH
+
+RELATED_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS related_papers (
+    paper_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    related_paper_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (paper_id, rank),
+    FOREIGN KEY (paper_id) REFERENCES papers(id) ON DELETE CASCADE,
+    FOREIGN KEY (related_paper_id) REFERENCES papers(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Finds the lists a recomputed paper appears in
+CREATE INDEX IF NOT EXISTS idx_related_papers_related_paper_id ON related_papers(related_paper_id);
+
+-- Papers whose neighbours must be recomputed. generation changes each time a
+-- paper is marked again, so a run only clears the marks it has seen.
+CREATE TABLE IF NOT EXISTS related_papers_dirty (
+    paper_id INTEGER PRIMARY KEY,
+    generation INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (paper_id) REFERENCES papers(id) ON DELETE CASCADE
+);
+
+CREATE TRIGGER IF NOT EXISTS abstracts_insert_related AFTER INSERT ON abstracts
+BEGIN
+    INSERT INTO related_papers_dirty (paper_id) VALUES (NEW.paper_id)
+    ON CONFLICT (paper_id) DO UPDATE SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS abstracts_update_related AFTER UPDATE OF abstract_text ON abstracts
+WHEN OLD.abstract_text IS NOT NEW.abstract_text
+BEGIN
+    INSERT INTO related_papers_dirty (paper_id) VALUES (NEW.paper_id)
+    ON CONFLICT (paper_id) DO UPDATE SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summaries_insert_related AFTER INSERT ON summaries
+BEGIN
+    INSERT INTO related_papers_dirty (paper_id) VALUES (NEW.paper_id)
+    ON CONFLICT (paper_id) DO UPDATE SET generation = generation + 1;
+END;
+
+-- Re-summarizing a paper into the same extended summary changes nothing here
+CREATE TRIGGER IF NOT EXISTS summaries_update_related AFTER UPDATE OF extended_summary ON summaries
+WHEN OLD.extended_summary IS NOT NEW.extended_summary
+BEGIN
+    INSERT INTO related_papers_dirty (paper_id) VALUES (NEW.paper_id)
+    ON CONFLICT (paper_id) DO UPDATE SET generation = generation + 1;
+END;
+'''
+
+# Words of two or more characters, starting with a letter
+TOKEN_PATTERN = re.compile(r'[a-z][a-z0-9]+')
+
+def create_related_tables(conn):
+    """
+    Create the related papers tables and the triggers that mark papers dirty.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'related_papers_dirty'").fetchone()
+    conn.executescript(RELATED_SCHEMA)
+    if not exists:
+        # Papers stored before the triggers existed are dirty unless they already have neighbours
+        conn.execute("""
+        INSERT OR IGNORE INTO related_papers_dirty (paper_id)
+        SELECT id FROM papers WHERE id NOT IN (SELECT paper_id FROM related_papers)
+        """)
+        conn.execute("DROP TABLE IF EXISTS related_paper_inputs")
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def build_tfidf_matrix(texts, min_df=2, max_df=0.5, max_terms=None):
+    """
+    Build L2-normalized TF-IDF vectors for a list of documents.
+    
+    Term frequencies are sublinear (1 + log tf). Terms in fewer than min_df
+    documents or in more than a max_df fraction of them carry no weight,
+    which drops typos and stop words without a stop word list. Common terms
+    also make the similarity products expensive while adding little to the
+    scores, as does the long tail of each document's weakest terms, which
+    max_terms cuts off.
+    
+    Args:
+        texts (iterable): Document texts
+        min_df (int): Fewest documents a term must appear in
+        max_df (float): Largest fraction of documents a term may appear in
+        max_terms (int): Most terms kept per document, by weight (None keeps all)
+    
+    Returns:
+        scipy.sparse.csr_matrix: One float32 row per document
+    """
+    vocabulary = {}
+    indices = array('i')
+    counts = array('f')
+    indptr = array('q', [0])
+    for text in texts:
+        token_counts = Counter(tokenize(text))
+        indices.extend([vocabulary.setdefault(token, len(vocabulary)) for token in token_counts])
+        counts.extend(token_counts.values())
+        indptr.append(len(indices))
+    
+    num_documents = len(indptr) - 1
+    matrix = sparse.csr_matrix(
+        (np.frombuffer(counts, dtype=np.float32), np.frombuffer(indices, dtype=np.int32),
+         np.frombuffer(indptr, dtype=np.int64)),
+        shape=(num_documents, len(vocabulary)))
+    
+    document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1 + num_documents) / (1 + document_frequency)) + 1
+    keep = (document_frequency >= min_df) & (document_frequency <= max_df * num_documents)
+    weights = np.where(keep, idf, 0).astype(np.float32)
+    
+    matrix.data = (1 + np.log(matrix.data)) * weights[matrix.indices]
+    if max_terms is not None:
+        keep_top_terms(matrix, max_terms)
+    matrix.eliminate_zeros()
+    
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags((1 / norms).astype(np.float32)).dot(matrix).tocsr()
+
+def keep_top_terms(matrix, max_terms):
+    """
+    Zero all but the highest weighted terms of each row, in place.
+    
+    Args:
+        matrix (scipy.sparse.csr_matrix): Term weights
+        max_terms (int): Terms kept per row
+    """
+    row_ids = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    # Sort each row's entries by descending weight and rank them within the row
+    order = np.lexsort((-matrix.data, row_ids))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - matrix.indptr[row_ids[order]]
+    matrix.data[ranks >= max_terms] = 0
+
+def iter_similarity_blocks(matrix, rows, block_size):
+    """
+    Compute the similarities of some papers to every paper, a block at a time.
+    
+    Args:
+        matrix (scipy.sparse.csr_matrix): Normalized TF-IDF vectors
+        rows (numpy.ndarray): Row indices of the papers to compare
+        block_size (int): Papers compared per matrix product
+    
+    Yields:
+        tuple: (block row indices, dense block of cosine similarities with
+            one row per paper in the block and one column per paper)
+    """
+    transposed = matrix.T.tocsc()
+    for start in range(0, len(rows), block_size):
+        block_rows = rows[start:start + block_size]
+        similarities = (matrix[block_rows] @ transposed).toarray()
+        # A paper is not related to itself
+        similarities[np.arange(len(block_rows)), block_rows] = -1
+        yield block_rows, similarities
+
+def top_neighbours(similarities, k, min_score):
+    """
+    Pick the k most similar papers from each row of a similarity block.
+    
+    Args:
+        similarities (numpy.ndarray): Block of similarities
+        k (int): Neighbours per paper
+        min_score (float): Smallest similarity kept
+    
+    Returns:
+        list: For each row, (column, score) pairs, most similar first
+    """
+    k = min(k, similarities.shape[1])
+    candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    neighbours = []
+    for row, columns in enumerate(candidates):
+        scores = similarities[row, columns]
+        order = np.argsort(-scores)
+        neighbours.append([(int(columns[i]), float(scores[i])) for i in order if scores[i] >= min_score])
+    return neighbours
+
+def load_neighbour_thresholds(conn, paper_ids, k):
+    """
+    Get the score a new neighbour must beat to enter each paper's list.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_ids (numpy.ndarray): Paper IDs, in matrix row order
+        k (int): Neighbours per paper
+    
+    Returns:
+        numpy.ndarray: Per row, the k-th best stored score, or the minimum
+            score for papers with fewer than k neighbours
+    """
+    thresholds = np.full(len(paper_ids), config.RELATED_PAPERS_MIN_SCORE, dtype=np.float32)
+    row_of = {paper_id: row for row, paper_id in enumerate(paper_ids.tolist())}
+    for paper_id, lowest, count in conn.execute("""
+    SELECT paper_id, MIN(score), COUNT(*) FROM related_papers GROUP BY paper_id
+    """):
+        if count >= k and paper_id in row_of:
+            thresholds[row_of[paper_id]] = max(lowest, config.RELATED_PAPERS_MIN_SCORE)
+    return thresholds
+
+def load_stale_references(conn, paper_ids, is_stale):
+    """
+    Find where papers being recomputed appear in other papers' stored lists.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_ids (numpy.ndarray): Paper IDs, in matrix row order
+        is_stale (numpy.ndarray): Per row, whether the paper is being recomputed
+    
+    Returns:
+        dict: Stale row to (row of the listing paper, stored score) pairs
+    """
+    row_of = {paper_id: row for row, paper_id in enumerate(paper_ids.tolist())}
+    stale_ids = paper_ids[is_stale].tolist()
+    references = {}
+    for start in range(0, len(stale_ids), 500):
+        chunk = stale_ids[start:start + 500]
+        for paper_id, related_id, score in conn.execute(f"""
+        SELECT paper_id, related_paper_id, score FROM related_papers
+        WHERE related_paper_id IN ({','.join('?' * len(chunk))})
+        """, chunk):
+            row = row_of.get(paper_id)
+            if row is not None and not is_stale[row]:
+                references.setdefault(row_of[related_id], []).append((row, score))
+    return references
+
+def store_neighbours(conn, paper_id, neighbours):
+    """
+    Replace a paper's stored neighbours. The caller commits.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_id (int): Database ID of the paper
+        neighbours (list): (related paper ID, score) pairs, most similar first
+    """
+    conn.execute("DELETE FROM related_papers WHERE paper_id = ?", (paper_id,))
+    conn.executemany("""
+    INSERT INTO related_papers (paper_id, rank, related_paper_id, score)
+    VALUES (?, ?, ?, ?)
+    """, [(paper_id, rank, related_id, score)
+          for rank, (related_id, score) in enumerate(neighbours, start=1)])
+
+def merge_neighbours(conn, paper_id, proposals, k):
+    """
+    Merge newly computed similarities into a paper's stored neighbours. The caller commits.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_id (int): Database ID of the paper
+        proposals (dict): Related paper ID to its new score
+        k (int): Neighbours per paper
+    """
+    merged = dict(conn.execute(
+        "SELECT related_paper_id, score FROM related_papers WHERE paper_id = ?", (paper_id,)).fetchall())
+    merged.update(proposals)
+    neighbours = sorted(merged.items(), key=lambda item: -item[1])[:k]
+    store_neighbours(conn, paper_id, neighbours)
+
+def update_related_papers(rebuild=False):
+    """
+    Recompute the neighbours of new and changed papers.
+    
+    Args:
+        rebuild (bool): Recompute every paper's neighbours
+    
+    Returns:
+        int: Number of papers whose neighbours were recomputed
+    """
+    k = config.RELATED_PAPERS_K
+    conn = db.acquire(DB_PATH)
+    
+    try:
+        # The dirty marks are checked first, so a run with nothing to do reads no text
+        dirty = conn.execute("""
+        SELECT d.paper_id, d.generation FROM related_papers_dirty d JOIN papers p ON p.id = d.paper_id
+        """).fetchall()
+        if not dirty and not rebuild:
+            logger.info("Related papers are up to date")
+            return 0
+        
+        rows = conn.execute("""
+        SELECT p.id, a.abstract_text, s.extended_summary
+        FROM papers p
+        LEFT JOIN abstracts a ON a.paper_id = p.id
+        LEFT JOIN summaries s ON s.paper_id = p.id
+        ORDER BY p.id
+        """).fetchall()
+        
+        dirty_ids = {paper_id for paper_id, _ in dirty}
+        stale = np.array([row for row, (paper_id, _, _) in enumerate(rows)
+                          if rebuild or paper_id in dirty_ids], dtype=np.int64)
+        if len(stale) == 0 or len(rows) < 2:
+            logger.info("Related papers are up to date")
+            return 0
+        
+        started = time.time()
+        logger.info(f"Computing related papers for {len(stale)} of {len(rows)} papers")
+        paper_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        matrix = build_tfidf_matrix((f"{abstract or ''} {summary or ''}" for _, abstract, summary in rows),
+                                    max_df=config.RELATED_PAPERS_MAX_DF,
+                                    max_terms=config.RELATED_PAPERS_MAX_TERMS)
+        
+        is_stale = np.zeros(len(rows), dtype=bool)
+        is_stale[stale] = True
+        proposals = {}
+        demoted = set()
+        
+        if rebuild:
+            conn.execute("DELETE FROM related_papers")
+            thresholds = None
+        else:
+            thresholds = load_neighbour_thresholds(conn, paper_ids, k)
+            references = load_stale_references(conn, paper_ids, is_stale)
+        
+        for block_rows, similarities in iter_similarity_blocks(matrix, stale, config.RELATED_PAPERS_BLOCK_SIZE):
+            for row, neighbours in zip(block_rows, top_neighbours(similarities, k, config.RELATED_PAPERS_MIN_SCORE)):
+                store_neighbours(conn, int(paper_ids[row]),
+                                 [(int(paper_ids[column]), score) for column, score in neighbours])
+            
+            if thresholds is None:
+                continue
+            # Papers that are not being recomputed may gain a stale paper as a neighbour
+            better = (similarities > thresholds) & ~is_stale
+            for block_row, column in zip(*np.nonzero(better)):
+                proposals.setdefault(int(paper_ids[column]), {})[int(paper_ids[block_rows[block_row]])] = \
+                    float(similarities[block_row, column])
+            
+            # Lists that already hold a stale paper take its new score. If it fell below
+            # the list's threshold, a paper that was not listed may now outrank it, so
+            # those lists are recomputed instead.
+            for block_row, row in enumerate(block_rows):
+                for column, _ in references.get(int(row), ()):
+                    score = float(similarities[block_row, column])
+                    if score < thresholds[column]:
+                        demoted.add(column)
+                    else:
+                        proposals.setdefault(int(paper_ids[column]), {})[int(paper_ids[row])] = score
+        
+        demoted_rows = np.array(sorted(demoted), dtype=np.int64)
+        for block_rows, similarities in iter_similarity_blocks(matrix, demoted_rows, config.RELATED_PAPERS_BLOCK_SIZE):
+            for row, neighbours in zip(block_rows, top_neighbours(similarities, k, config.RELATED_PAPERS_MIN_SCORE)):
+                store_neighbours(conn, int(paper_ids[row]),
+                                 [(int(paper_ids[column]), score) for column, score in neighbours])
+                proposals.pop(int(paper_ids[row]), None)
+        
+        for paper_id, paper_proposals in proposals.items():
+            merge_neighbours(conn, paper_id, paper_proposals, k)
+        
+        # Papers marked again while this ran stay dirty for the next run
+        conn.executemany("DELETE FROM related_papers_dirty WHERE paper_id = ? AND generation = ?", dirty)
+        conn.commit()
+        
+        logger.info(f"Computed related papers for {len(stale)} papers, recomputed {len(demoted)} and "
+                    f"updated {len(proposals)} other papers in {time.time() - started:.1f} seconds")
+        return len(stale)
+    
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error computing related papers: {str(e)}")
+        return 0
+    
+    finally:
+        db.release(conn)
+
+def get_related_papers(conn, paper_id):
+    """
+    Get a paper's stored neighbours, most similar first.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_id (int): Database ID of the paper
+    
+    Returns:
+        list: Rows with the related paper's listing columns and its score
+    """
+    return conn.execute("""
+    SELECT l.paper_id, l.arxiv_id, l.title, l.published_date, l.authors, l.categories, r.score
+    FROM related_papers r
+    JOIN paper_listings l ON l.paper_id = r.related_paper_id
+    WHERE r.paper_id = ?
+    ORDER BY r.rank
+    """, (paper_id,)).fetchall()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute related papers.")
+    parser.add_argument('--rebuild', action='store_true', help="recompute every paper's neighbours")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=config.LOG_LEVEL, format=config.LOG_FORMAT)
+    count = update_related_papers(rebuild=args.rebuild)
+    print(f"Computed related papers for {count} papers")
@@ -0,0 +1,172 @@
+"""
+In-process cache of rendered web responses.
+
+Pages only change when the worker ingests or summarizes papers, and every
+such write bumps the database's data version (see the data_version table).
+Cached responses are tagged with the version they were rendered at and the
+whole cache is dropped once the version moves on. The version is polled at
+most once per poll interval, so hot pages are served without touching
+SQLite. Cached responses carry an ETag and Last-Modified header, and
+conditional requests that still match get a 304.
+"""
+
+import time
+import hashlib
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from flask import request, Response, make_response
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """Size-bounded LRU cache of response bodies, invalidated by a data version."""
+    
+    def __init__(self, load_version, max_entries=1024, max_bytes=64 * 1024 ** 2, poll_interval=1.0):
+        """
+        Args:
+            load_version (callable): Returns the current (version, last_modified
+                datetime) of the underlying data
+            max_entries (int): Most responses kept
+            max_bytes (int): Most response body bytes kept
+            poll_interval (float): Seconds a loaded data version is trusted
+        """
+        self.load_version = load_version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._last_modified = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+    
+    def current_version(self):
+        """
+        Get the data version, reloading it if the last check is too old.
+        
+        Returns:
+            tuple: (version, last_modified)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.poll_interval:
+                return self._version, self._last_modified
+        
+        version, last_modified = self.load_version()
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    logger.info(f"Data version is now {version}; dropping {len(self._entries)} cached responses")
+                self._entries.clear()
+                self._bytes = 0
+                self._version = version
+                self._last_modified = last_modified
+            self._checked_at = now
+        return version, last_modified
+    
+    def get(self, key, version):
+        """
+        Look up a cached response rendered at the given data version.
+        
+        Args:
+            key (tuple): Cache key
+            version (int): Current data version
+        
+        Returns:
+            tuple: (body, mimetype, etag), or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+    
+    def put(self, key, version, body, mimetype):
+        """
+        Cache a response body.
+        
+        Args:
+            key (tuple): Cache key
+            version (int): Data version the body was rendered at
+            body (bytes): Response body
+            mimetype (str): Response MIME type
+        
+        Returns:
+            str: The body's ETag
+        """
+        etag = hashlib.sha1(body).hexdigest()
+        if len(body) > self.max_bytes:
+            return etag
+        
+        with self._lock:
+            if version != self._version:
+                # The data changed while the response was rendered
+                return etag
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._bytes -= len(old_entry[1])
+            self._entries[key] = (version, body, mimetype, etag)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[1])
+        return etag
+    
+    def stats(self):
+        """
+        Get cache counters and current usage.
+        
+        Returns:
+            dict: hits, misses, entries, bytes and version
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'version': self._version
+            }
+    
+    def cached(self, view):
+        """
+        Decorate a Flask view so its successful responses are cached.
+        
+        Responses are keyed by the request path and query arguments.
+        
+        Args:
+            view (callable): The view function
+        
+        Returns:
+            callable: The caching view
+        """
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version, last_modified = self.current_version()
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            
+            entry = self.get(key, version)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                body = response.get_data()
+                etag = self.put(key, version, body, response.mimetype)
+            else:
+                body, mimetype, etag = entry
+                response = Response(body, mimetype=mimetype)
+            
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response.make_conditional(request)
+        
+        return wrapper
@@ -0,0 +1,227 @@
+"""
+Full-text search over papers with SQLite FTS5.
+
+The papers_fts index holds one row per paper (rowid = papers.id) with the
+title, abstract and extended summary, plus the full text when
+SEARCH_INDEX_FULL_TEXT is enabled. Triggers keep the title, abstract and
+summary columns in sync with their tables; full texts are indexed by the
+summarizer when it stores them. Results are ranked with BM25, weighting
+title matches above abstract, summary and full text matches. Searches that
+match a large part of the corpus rank only their most recent matches, which
+keeps common terms as fast as rare ones.
+"""
+
+import re
+import argparse
+import logging
+from markupsafe import escape
+import config
+import db
+
+logger = logging.getLogger(__name__)
+
+# Database setup
+DB_PATH = config.DB_PATH
+
+# BM25 weights of the title, abstract, summary and full_text columns
+BM25_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+SEARCH_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+    title, abstract, summary, full_text,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS papers_update_fts AFTER UPDATE OF title ON papers
+BEGIN
+    UPDATE papers_fts SET title = NEW.title WHERE rowid = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS papers_delete_fts AFTER DELETE ON papers
+BEGIN
+    DELETE FROM papers_fts WHERE rowid = OLD.id;
+END;
+
+-- A paper's row is created with its abstract, which is stored right after the paper
+CREATE TRIGGER IF NOT EXISTS abstracts_insert_fts AFTER INSERT ON abstracts
+BEGIN
+    INSERT OR REPLACE INTO papers_fts (rowid, title, abstract)
+    SELECT id, title, NEW.abstract_text FROM papers WHERE id = NEW.paper_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS abstracts_update_fts AFTER UPDATE OF abstract_text ON abstracts
+BEGIN
+    UPDATE papers_fts SET abstract = NEW.abstract_text WHERE rowid = NEW.paper_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summaries_insert_fts AFTER INSERT ON summaries
+BEGIN
+    UPDATE papers_fts SET summary = NEW.extended_summary WHERE rowid = NEW.paper_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summaries_update_fts AFTER UPDATE OF extended_summary ON summaries
+BEGIN
+    UPDATE papers_fts SET summary = NEW.extended_summary WHERE rowid = NEW.paper_id;
+END;
+'''
+
+# Marks highlighted terms in snippets until the text around them is escaped
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+# FTS5 ranks every match by BM25 and only builds snippets for the rows returned
+SEARCH_QUERY = '''
+SELECT l.paper_id, l.arxiv_id, l.title, l.published_date, l.entry_url, l.pdf_url,
+       l.authors, l.categories, m.snippet, m.rank
+FROM (
+    SELECT rowid, rank,
+           snippet(papers_fts, -1, char(2), char(3), '...', ?) AS snippet
+    FROM papers_fts
+    WHERE papers_fts MATCH ?
+    ORDER BY rank
+    LIMIT ? OFFSET ?
+) m
+JOIN paper_listings l ON l.paper_id = m.rowid
+ORDER BY m.rank
+'''
+
+# Words, optionally ending in * for a prefix search
+QUERY_TERM_PATTERN = re.compile(r'\w+\*?')
+
+def create_search_index(conn):
+    """
+    Create the search index and its triggers, filling the index if it is new.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'papers_fts'").fetchone()
+    conn.executescript(SEARCH_SCHEMA)
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    conn.execute(f"INSERT INTO papers_fts (papers_fts, rank) VALUES ('rank', 'bm25({weights})')")
+    if not exists:
+        count = rebuild_search_index(conn)
+        logger.info(f"Built the search index for {count} papers")
+
+def rebuild_search_index(conn, include_full_text=None):
+    """
+    Rebuild the search index from the papers, abstracts, summaries and full texts.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        include_full_text (bool): Index full texts (defaults to SEARCH_INDEX_FULL_TEXT)
+    
+    Returns:
+        int: Number of papers indexed
+    """
+    if include_full_text is None:
+        include_full_text = config.SEARCH_INDEX_FULL_TEXT
+    
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM papers_fts")
+    cursor.execute("""
+    INSERT INTO papers_fts (rowid, title, abstract, summary, full_text)
+    SELECT p.id, p.title, a.abstract_text, s.extended_summary,
+           CASE WHEN ? THEN decode_full_text(f.full_text, f.encoding, f.blob_segment, f.blob_offset, f.blob_length) END
+    FROM papers p
+    LEFT JOIN abstracts a ON a.paper_id = p.id
+    LEFT JOIN summaries s ON s.paper_id = p.id
+    LEFT JOIN full_texts f ON f.paper_id = p.id
+    """, (bool(include_full_text),))
+    count = cursor.rowcount
+    # Merge the index b-trees for faster queries
+    cursor.execute("INSERT INTO papers_fts (papers_fts) VALUES ('optimize')")
+    return count
+
+def index_full_text(conn, paper_id, full_text):
+    """
+    Add a paper's full text to the search index, if full texts are indexed.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_id (int): Database ID of the paper
+        full_text (str): The paper's full text
+    """
+    if not config.SEARCH_INDEX_FULL_TEXT:
+        return
+    conn.execute("UPDATE papers_fts SET full_text = ? WHERE rowid = ?", (full_text, paper_id))
+
+def build_match_query(text):
+    """
+    Turn user input into an FTS5 query that matches papers containing every word.
+    
+    Each word is quoted, so FTS5 operators and punctuation in the input are
+    treated as plain text rather than query syntax.
+    
+    Args:
+        text (str): The user's search input
+    
+    Returns:
+        str: The MATCH expression, or None if the input has no words
+    """
+    terms = []
+    for term in QUERY_TERM_PATTERN.findall(text):
+        if term.endswith('*'):
+            terms.append(f'"{term[:-1]}"*')
+        else:
+            terms.append(f'"{term}"')
+    return ' '.join(terms) if terms else None
+
+def format_snippet(snippet):
+    """
+    Escape a snippet's text for HTML and wrap its matched terms in <mark>.
+    
+    Args:
+        snippet (str): Snippet from the search index
+    
+    Returns:
+        str: The snippet as HTML
+    """
+    html = str(escape(snippet or ''))
+    return html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+def search_papers(conn, text, limit=10, offset=0):
+    """
+    Find the papers that best match a search, best first.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        text (str): The user's search input
+        limit (int): Most results returned
+        offset (int): Number of better results to skip
+    
+    Returns:
+        tuple: (result rows, total number of matching papers); each row has
+            the paper's listing columns plus its HTML snippet and BM25 rank
+    """
+    match_query = build_match_query(text)
+    if match_query is None:
+        return [], 0
+    
+    cursor = conn.execute(SEARCH_QUERY, (config.SEARCH_SNIPPET_TOKENS, match_query, limit, offset))
+    columns = [column[0] for column in cursor.description]
+    rows = cursor.fetchall()
+    total = conn.execute("SELECT COUNT(*) FROM papers_fts WHERE papers_fts MATCH ?", (match_query,)).fetchone()[0]
+    
+    results = []
+    for row in rows:
+        result = dict(zip(columns, row))
+        result['snippet'] = format_snippet(result['snippet'])
+        results.append(result)
+    return results, total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the paper search index.")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the search index from scratch")
+    parser.add_argument('--full-text', action=argparse.BooleanOptionalAction, default=None,
+                        help="index full texts (defaults to SEARCH_INDEX_FULL_TEXT in config.py)")
+    args = parser.parse_args()
+    
+    if args.rebuild:
+        with db.connection(DB_PATH) as conn:
+            count = rebuild_search_index(conn, args.full_text)
+            conn.commit()
+        print(f"Rebuilt the search index for {count} papers")
+    else:
+        parser.print_help()
@@ -6,7 +6,7 @@ mkdir -p /home/ubuntu/quantum_paper_summarizer/logs
 mkdir -p /home/ubuntu/quantum_paper_summarizer/data
 
 # Install required Python packages
-pip3 install flask apscheduler arxiv nltk PyPDF2 networkx numpy gunicorn
+pip3 install flask apscheduler arxiv nltk PyPDF2 numpy scipy gunicorn
 
 # Download NLTK resources
 python3 -c "import nltk; nltk.download('punkt'); nltk.download('stopwords')"
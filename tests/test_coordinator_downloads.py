@@ -0,0 +1,180 @@
+"""
+Tests for the process pool's download path.
+
+process_papers_in_parallel downloads PDFs in the coordinating process, so
+the per-host limits are shared, and hands each worker the downloaded file.
+These run against a local HTTP server and a temporary PDF cache.
+"""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import pdf_cache
+import pdf_extractor
+import paper_processor
+from paper_processor import download_stage, extract_stage
+
+def make_pdf(text):
+    """Build a one-page PDF showing a line of text."""
+    stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+        '/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+        f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream',
+    ]
+    pdf = '%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f'{number} 0 obj\n{body}\nendobj\n'
+    xref = len(pdf)
+    pdf += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'
+    pdf += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets)
+    pdf += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'
+    return pdf.encode('latin-1')
+
+class PDFHandler(BaseHTTPRequestHandler):
+    """Serves /pdf/<name> as a PDF mentioning the name; /pdf/missing is a 404."""
+    
+    protocol_version = 'HTTP/1.1'
+    requests = []
+    
+    def do_GET(self):
+        PDFHandler.requests.append(self.path)
+        if self.path.endswith('/missing'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = make_pdf(f"Text of {self.path.rsplit('/', 1)[-1]}")
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+class CoordinatorDownloadTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PDFHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}/pdf/'
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.saved = {name: getattr(config, name) for name in
+                      ('PDF_CACHE_ENABLED', 'PDF_CACHE_DIR', 'PDF_CACHE_MAX_BYTES')}
+        config.PDF_CACHE_ENABLED = True
+        config.PDF_CACHE_DIR = os.path.join(self.temp_dir, 'cache')
+        config.PDF_CACHE_MAX_BYTES = 10 * 1024 ** 2
+        pdf_cache._cache = None
+        self.saved_interval = pdf_extractor._rate_limiter.min_interval
+        pdf_extractor._rate_limiter.min_interval = 0
+        PDFHandler.requests = []
+    
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(config, name, value)
+        pdf_cache._cache = None
+        pdf_extractor._rate_limiter.min_interval = self.saved_interval
+        shutil.rmtree(self.temp_dir)
+    
+    def job(self, name, paper_id=1):
+        return {'paper_id': paper_id, 'arxiv_id': name, 'pdf_url': self.base_url + name, 'abstract': 'An abstract.'}
+    
+    def cache_key(self, name):
+        return pdf_cache.cache_key_for_url(self.base_url + name)
+    
+    def test_cache_miss_downloads_and_caches(self):
+        job = download_stage(self.job('2501.00001v1'))
+        
+        self.assertEqual(PDFHandler.requests, ['/pdf/2501.00001v1'])
+        self.assertTrue(job['pdf_is_temporary'])
+        self.assertIsNotNone(pdf_cache.get_pdf_cache().get_path(self.cache_key('2501.00001v1')))
+        
+        result = extract_stage(job)
+        self.assertEqual(result['extraction_status'], 'success')
+        self.assertIn('Text of 2501.00001v1', result['full_text'])
+        self.assertFalse(os.path.exists(job['pdf_path']))
+        # The cached copy outlives the worker's temporary file
+        self.assertIsNotNone(pdf_cache.get_pdf_cache().get_path(self.cache_key('2501.00001v1')))
+    
+    def test_cache_hit_does_not_download(self):
+        cache = pdf_cache.get_pdf_cache()
+        cached_path = cache.put(self.cache_key('2501.00002v1'), make_pdf('Text of the cached copy'))
+        
+        job = download_stage(self.job('2501.00002v1'))
+        
+        self.assertEqual(PDFHandler.requests, [])
+        self.assertTrue(job['pdf_is_temporary'])
+        self.assertNotEqual(job['pdf_path'], cached_path)
+        
+        # Evicting the entry does not take the file away from the worker
+        with cache._connect() as conn:
+            cache._remove_entry(conn, self.cache_key('2501.00002v1'), os.path.basename(cached_path)[:-len('.pdf')])
+        self.assertFalse(os.path.exists(cached_path))
+        
+        result = extract_stage(job)
+        self.assertIn('Text of the cached copy', result['full_text'])
+    
+    def test_failed_download_falls_back_to_abstract(self):
+        job = download_stage(self.job('missing'))
+        
+        self.assertEqual(PDFHandler.requests, ['/pdf/missing'])
+        self.assertIsNone(job['pdf_path'])
+        
+        result = extract_stage(job)
+        self.assertEqual(result['extraction_status'], 'failed')
+        self.assertEqual(result['full_text'], 'An abstract.')
+    
+    def test_workers_extract_the_coordinators_files(self):
+        jobs = {paper_id: self.job(f'2501.0010{paper_id}v1', paper_id) for paper_id in range(1, 5)}
+        jobs[5] = self.job('missing', 5)
+        cache = pdf_cache.get_pdf_cache()
+        cache.put(self.cache_key('2501.00101v1'), make_pdf('Text of 2501.00101v1'))
+        
+        results = {}
+        saved_db_path = paper_processor.DB_PATH
+        paper_processor.DB_PATH = os.path.join(self.temp_dir, 'papers.db')
+        sqlite3.connect(paper_processor.DB_PATH).close()
+        try:
+            processed = paper_processor.process_papers_in_parallel(
+                list(jobs), 2, load_job=lambda conn, paper_id: jobs[paper_id],
+                summarize=extract_stage, store=lambda conn, result: results.update({result['paper_id']: result}))
+        finally:
+            paper_processor.DB_PATH = saved_db_path
+        
+        self.assertEqual(processed, 5)
+        # Only the coordinator's download stage reached the server: one
+        # request per uncached paper, none for the cache hit
+        self.assertEqual(sorted(PDFHandler.requests),
+                         ['/pdf/2501.00102v1', '/pdf/2501.00103v1', '/pdf/2501.00104v1', '/pdf/missing'])
+        for paper_id in range(1, 5):
+            with self.subTest(paper_id=paper_id):
+                self.assertEqual(results[paper_id]['extraction_status'], 'success')
+                self.assertIn(f'Text of 2501.0010{paper_id}v1', results[paper_id]['full_text'])
+        self.assertEqual(results[5]['extraction_status'], 'failed')
+
+if __name__ == '__main__':
+    unittest.main()
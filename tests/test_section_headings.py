@@ -0,0 +1,98 @@
+"""
+Regression tests for section heading detection in extracted paper text.
+
+PDF extraction wraps lines at arbitrary points, so lines of ordinary prose
+must not be mistaken for section headings.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from paper_processor import match_section_heading, split_into_sections
+
+class MatchSectionHeadingTest(unittest.TestCase):
+
+    def test_headings(self):
+        cases = {
+            "Introduction": 'introduction',
+            "1 Introduction": 'introduction',
+            "2. Results and discussion": 'results and discussion',
+            "II. RELATED WORK": 'related work',
+            "3.1 Model of the noise": 'model',
+            "Conclusions.": 'conclusions',
+            "References": 'references',
+            "Acknowledgments": 'acknowledgments',
+            "Appendix": 'appendix',
+            "APPENDIX B": 'appendix',
+            "Appendix A: Proofs of the bounds": 'appendix',
+            "Appendix 2. Derivations": 'appendix',
+        }
+        for line, name in cases.items():
+            with self.subTest(line=line):
+                self.assertEqual(match_section_heading(line), name)
+    
+    def test_wrapped_prose_lines(self):
+        lines = [
+            "appendix, which we omit here.",
+            "a model of the noise",
+            "x results in the",
+            "results in the loss of coherence",
+            "Appendix A, where we derive the bound,",
+            "Results, which we discuss below,",
+            "Model of the noise that we consider",
+            "Summary statistics are shown in Fig. 2",
+            "Modeling the cavity requires",
+            "theory of open quantum systems",
+        ]
+        for line in lines:
+            with self.subTest(line=line):
+                self.assertIsNone(match_section_heading(line))
+
+class SplitIntoSectionsTest(unittest.TestCase):
+
+    def test_prose_mentioning_an_appendix_keeps_later_sections(self):
+        text = "\n".join([
+            "1 Introduction",
+            "We study decoherence in superconducting qubits.",
+            "2 Methods",
+            "The derivation is given in",
+            "Appendix A, where we bound the error.",
+            "3 Results",
+            "The fidelity exceeds the threshold.",
+            "4 Conclusion",
+            "The scheme is practical.",
+        ])
+        names = [name for name, _ in split_into_sections(text)]
+        self.assertEqual(names, ['introduction', 'methods', 'results', 'conclusion'])
+    
+    def test_back_matter_is_skipped(self):
+        text = "\n".join([
+            "1 Introduction",
+            "We study decoherence.",
+            "Acknowledgments",
+            "We thank the funding agency.",
+            "References",
+            "[1] A. Author, Phys. Rev. Lett. 101, 1000 (2020).",
+            "Appendix A: Proofs",
+            "The bound follows from convexity.",
+        ])
+        sections = split_into_sections(text)
+        self.assertEqual([name for name, _ in sections], ['introduction'])
+    
+    def test_sections_after_back_matter_are_kept(self):
+        text = "\n".join([
+            "1 Introduction",
+            "We study decoherence.",
+            "References",
+            "[1] A. Author, Phys. Rev. Lett. 101, 1000 (2020).",
+            "5 Discussion",
+            "The results hold generally.",
+        ])
+        names = [name for name, _ in split_into_sections(text)]
+        self.assertEqual(names, ['introduction', 'discussion'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,470 @@
+"""
+Compressed storage of extracted full texts.
+
+Full texts are by far the largest rows in the database. Stored as plain
+TEXT they bloat the file and push hot listing pages out of SQLite's page
+cache, so they are stored zlib-compressed instead, optionally primed with a
+dictionary trained on existing texts. The full_texts.encoding column says how
+each row's payload is stored:
+
+    plain      the full_text column holds the text itself
+    zlib       zlib-compressed UTF-8
+    zlib:<id>  zlib-compressed UTF-8 using dictionary <id> of text_dictionaries
+
+With FULL_TEXT_STORAGE = 'blob_store' the encoded payload is appended to the
+segment files of blob_store.py instead of the full_text column, and the row
+records its blob_segment, blob_offset and blob_length.
+
+Rows are read as StoredText objects, which only decompress their payload when
+the text is asked for, so jobs can carry a compressed text to a worker
+process and queries can skip texts they never look at; texts in the blob
+store are not even read until then. SQL can decode a row with the
+decode_full_text(full_text, encoding, blob_segment, blob_offset, blob_length)
+function, which is registered on every pooled connection.
+"""
+
+import os
+import zlib
+import argparse
+import logging
+from collections import Counter
+import config
+from blob_store import get_blob_store
+
+logger = logging.getLogger(__name__)
+
+# Database setup
+DB_PATH = config.DB_PATH
+
+ENCODING_PLAIN = 'plain'
+ENCODING_ZLIB = 'zlib'
+
+STORAGE_BLOB_STORE = 'blob_store'
+
+# zlib only looks back this far, so a longer dictionary is wasted
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+TEXT_STORE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS text_dictionaries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dictionary BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+'''
+
+# Dictionaries never change once written; cached by (database file, ID)
+_dictionaries = {}
+
+class StoredText:
+    """A full text as stored, read and decompressed the first time it is used."""
+    
+    __slots__ = ('_payload', 'encoding', 'dictionary', 'location', '_text')
+    
+    def __init__(self, payload, encoding, dictionary=None, location=None):
+        """
+        Args:
+            payload (str or bytes): The full_text column; unused with a location
+            encoding (str): The encoding column
+            dictionary (bytes): The zlib dictionary, for zlib:<id> encodings
+            location (tuple): (store directory, segment, offset, length) of
+                a payload kept in the blob store
+        """
+        self._payload = None if location else payload
+        self.encoding = encoding or ENCODING_PLAIN
+        self.dictionary = dictionary
+        self.location = location
+        self._text = None
+    
+    @property
+    def payload(self):
+        """The encoded payload, a memoryview of the mapped segment for blob store texts."""
+        if self._payload is None and self.location is not None:
+            store_dir, segment, offset, length = self.location
+            self._payload = get_blob_store(store_dir).read(segment, offset, length)
+        return self._payload
+    
+    @property
+    def text(self):
+        """The full text, decompressed on first access."""
+        if self._text is None:
+            self._text = decode_payload(self.payload, self.encoding, self.dictionary)
+        return self._text
+    
+    def __getstate__(self):
+        # Pickled for worker processes still compressed; blob store texts
+        # travel as their location and are read by the receiving process
+        payload = None if self.location else self._payload
+        return payload, self.encoding, self.dictionary, self.location
+    
+    def __setstate__(self, state):
+        self._payload, self.encoding, self.dictionary, self.location = state
+        self._text = None
+
+def create_text_store_tables(conn):
+    """
+    Create the tables of the text store.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+    """
+    conn.executescript(TEXT_STORE_SCHEMA)
+
+def compress_text(text, level=None, dictionary=None):
+    """
+    Compress a text with zlib.
+    
+    Args:
+        text (str): The text
+        level (int): zlib compression level (defaults to FULL_TEXT_COMPRESSION_LEVEL)
+        dictionary (bytes): Optional preset dictionary
+    
+    Returns:
+        bytes: The compressed text
+    """
+    if level is None:
+        level = config.FULL_TEXT_COMPRESSION_LEVEL
+    if dictionary:
+        compressor = zlib.compressobj(level, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level)
+    return compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+def decode_payload(payload, encoding, dictionary=None):
+    """
+    Turn a stored payload back into text.
+    
+    Args:
+        payload (str or bytes): The full_text column
+        encoding (str): The encoding column
+        dictionary (bytes): The zlib dictionary, for zlib:<id> encodings
+    
+    Returns:
+        str: The text
+    
+    Raises:
+        ValueError: If the encoding is unknown
+    """
+    if payload is None:
+        return None
+    if not encoding or encoding == ENCODING_PLAIN:
+        return payload if isinstance(payload, str) else str(payload, 'utf-8')
+    if encoding == ENCODING_ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if encoding.startswith(ENCODING_ZLIB + ':'):
+        decompressor = zlib.decompressobj(zdict=dictionary)
+        return (decompressor.decompress(payload) + decompressor.flush()).decode('utf-8')
+    raise ValueError(f"Unknown full text encoding: {encoding}")
+
+def payload_size(payload):
+    """Get the stored size of a payload in bytes."""
+    return len(payload.encode('utf-8')) if isinstance(payload, str) else len(payload)
+
+def _database_file(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+def get_dictionary(conn, dictionary_id):
+    """
+    Get a stored compression dictionary.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        dictionary_id (int): ID in text_dictionaries
+    
+    Returns:
+        bytes: The dictionary
+    
+    Raises:
+        KeyError: If there is no such dictionary
+    """
+    key = (_database_file(conn), dictionary_id)
+    if key not in _dictionaries:
+        row = conn.execute("SELECT dictionary FROM text_dictionaries WHERE id = ?", (dictionary_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Compression dictionary {dictionary_id} not found")
+        _dictionaries[key] = bytes(row[0])
+    return _dictionaries[key]
+
+def dictionary_for(conn, encoding):
+    """Get the dictionary an encoding refers to, or None if it uses none."""
+    if encoding and encoding.startswith(ENCODING_ZLIB + ':'):
+        return get_dictionary(conn, int(encoding.split(':', 1)[1]))
+    return None
+
+def stored_text(conn, payload, encoding, blob_segment=None, blob_offset=None, blob_length=None):
+    """
+    Wrap a full_texts row read by any query as a StoredText.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection the row came from
+        payload (str or bytes): The full_text column
+        encoding (str): The encoding column
+        blob_segment (int): The blob_segment column, None for inline texts
+        blob_offset (int): The blob_offset column
+        blob_length (int): The blob_length column
+    
+    Returns:
+        StoredText: The text, not yet read or decompressed
+    """
+    location = None
+    if blob_segment is not None:
+        location = (get_blob_store().store_dir, blob_segment, blob_offset, blob_length)
+    return StoredText(payload, encoding, dictionary_for(conn, encoding), location)
+
+def register_functions(conn):
+    """
+    Register decode_full_text(full_text, encoding, blob_segment, blob_offset,
+    blob_length) on a connection.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+    """
+    def decode_full_text(payload, encoding, blob_segment, blob_offset, blob_length):
+        return stored_text(conn, payload, encoding, blob_segment, blob_offset, blob_length).text
+    
+    conn.create_function('decode_full_text', 5, decode_full_text, deterministic=True)
+
+def current_encoding(conn):
+    """
+    Get the encoding new full texts are stored with.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+    
+    Returns:
+        tuple: (encoding, dictionary), the dictionary None unless one is used
+    """
+    if config.FULL_TEXT_COMPRESSION != ENCODING_ZLIB:
+        return ENCODING_PLAIN, None
+    if config.FULL_TEXT_USE_DICTIONARY:
+        row = conn.execute("SELECT MAX(id) FROM text_dictionaries").fetchone()
+        if row and row[0] is not None:
+            return f"{ENCODING_ZLIB}:{row[0]}", get_dictionary(conn, row[0])
+    return ENCODING_ZLIB, None
+
+def encode_text(conn, text):
+    """
+    Encode a text the way new full texts are stored.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        text (str): The text
+    
+    Returns:
+        tuple: (payload, encoding)
+    """
+    encoding, dictionary = current_encoding(conn)
+    if encoding == ENCODING_PLAIN:
+        return text, encoding
+    return compress_text(text, dictionary=dictionary), encoding
+
+def place_text(conn, text):
+    """
+    Encode a text and, with FULL_TEXT_STORAGE = 'blob_store', append it to the blob store.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        text (str): The text
+    
+    Returns:
+        tuple: (full_text column, encoding, (blob_segment, blob_offset, blob_length)),
+            the blob columns None for texts stored inline
+    """
+    payload, encoding = encode_text(conn, text)
+    if config.FULL_TEXT_STORAGE != STORAGE_BLOB_STORE:
+        return payload, encoding, (None, None, None)
+    data = payload.encode('utf-8') if isinstance(payload, str) else payload
+    # full_text is NOT NULL; the text lives in the blob store
+    return '', encoding, get_blob_store().append(data)
+
+def write_full_text(conn, paper_id, full_text, extraction_status, content_hash):
+    """
+    Insert or update a paper's full text, compressed and placed as configured. The caller commits.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_id (int): Database ID of the paper
+        full_text (str): The text
+        extraction_status (str): How the text was obtained
+        content_hash (str): Fingerprint of the text
+    """
+    payload, encoding, location = place_text(conn, full_text)
+    conn.execute("""
+    INSERT INTO full_texts (paper_id, full_text, encoding, blob_segment, blob_offset, blob_length,
+                            extraction_status, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(paper_id) DO UPDATE SET
+        full_text = excluded.full_text,
+        encoding = excluded.encoding,
+        blob_segment = excluded.blob_segment,
+        blob_offset = excluded.blob_offset,
+        blob_length = excluded.blob_length,
+        extraction_status = excluded.extraction_status,
+        content_hash = excluded.content_hash
+    """, (paper_id, payload, encoding, *location, extraction_status, content_hash))
+
+def read_full_text(conn, paper_id):
+    """
+    Look up a paper's full text without reading or decompressing it.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        paper_id (int): Database ID of the paper
+    
+    Returns:
+        tuple: (StoredText, extraction_status), or None if there is no full text
+    """
+    row = conn.execute("""
+    SELECT full_text, encoding, blob_segment, blob_offset, blob_length, extraction_status
+    FROM full_texts WHERE paper_id = ?
+    """, (paper_id,)).fetchone()
+    if row is None:
+        return None
+    return stored_text(conn, *row[:5]), row[5]
+
+def train_dictionary(texts, size=MAX_DICTIONARY_SIZE):
+    """
+    Build a zlib preset dictionary from sample texts.
+    
+    The dictionary is made of the words and word pairs that save the most
+    bytes across the samples (frequency times length). zlib codes matches
+    near the end of its window most cheaply, so the most valuable strings
+    go last.
+    
+    Args:
+        texts (iterable): Sample texts
+        size (int): Largest dictionary size in bytes
+    
+    Returns:
+        bytes: The dictionary
+    """
+    counts = Counter()
+    for text in texts:
+        words = text.split()
+        counts.update(words)
+        counts.update(' '.join(pair) for pair in zip(words, words[1:]))
+    
+    scored = sorted(((count * len(string), string) for string, count in counts.items() if count > 1),
+                    reverse=True)
+    chosen = []
+    used = 0
+    for _, string in scored:
+        encoded = string.encode('utf-8') + b' '
+        if used + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        used += len(encoded)
+    return b''.join(reversed(chosen))
+
+def store_dictionary(conn, dictionary):
+    """
+    Store a new compression dictionary. The caller commits.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        dictionary (bytes): The dictionary
+    
+    Returns:
+        int: The dictionary's ID
+    """
+    cursor = conn.execute("INSERT INTO text_dictionaries (dictionary) VALUES (?)", (dictionary,))
+    return cursor.lastrowid
+
+def train_and_store_dictionary(conn, sample_size=None):
+    """
+    Train a dictionary on a sample of the stored full texts and store it.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        sample_size (int): Texts sampled (defaults to FULL_TEXT_DICTIONARY_SAMPLE)
+    
+    Returns:
+        int: The new dictionary's ID, or None if there are no full texts
+    """
+    if sample_size is None:
+        sample_size = config.FULL_TEXT_DICTIONARY_SAMPLE
+    rows = conn.execute("""
+    SELECT full_text, encoding, blob_segment, blob_offset, blob_length
+    FROM full_texts ORDER BY RANDOM() LIMIT ?
+    """, (sample_size,)).fetchall()
+    if not rows:
+        return None
+    dictionary = train_dictionary(stored_text(conn, *row).text for row in rows)
+    return store_dictionary(conn, dictionary)
+
+def reencode_stored_texts(conn, batch_size=None):
+    """
+    Rewrite every full text not stored the way new texts are, a batch per transaction.
+    
+    Texts are re-encoded when their encoding differs from the configured one
+    and moved into or out of the blob store to match FULL_TEXT_STORAGE.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        batch_size (int): Rows rewritten per transaction (defaults to FULL_TEXT_MIGRATION_BATCH_SIZE)
+    
+    Returns:
+        tuple: (rows rewritten, bytes before, bytes after)
+    """
+    if batch_size is None:
+        batch_size = config.FULL_TEXT_MIGRATION_BATCH_SIZE
+    encoding, _ = current_encoding(conn)
+    in_blob_store = config.FULL_TEXT_STORAGE == STORAGE_BLOB_STORE
+    
+    count = bytes_before = bytes_after = 0
+    last_id = 0
+    while True:
+        rows = conn.execute("""
+        SELECT paper_id, full_text, encoding, blob_segment, blob_offset, blob_length FROM full_texts
+        WHERE paper_id > ? AND (encoding IS NOT ? OR (blob_segment IS NOT NULL) != ?)
+        ORDER BY paper_id
+        LIMIT ?
+        """, (last_id, encoding, in_blob_store, batch_size)).fetchall()
+        if not rows:
+            break
+        
+        updates = []
+        for paper_id, *stored in rows:
+            old = stored_text(conn, *stored)
+            payload, new_encoding, location = place_text(conn, old.text)
+            bytes_before += payload_size(old.payload)
+            bytes_after += location[2] if location[0] is not None else payload_size(payload)
+            updates.append((payload, new_encoding, *location, paper_id))
+        conn.executemany("""
+        UPDATE full_texts
+        SET full_text = ?, encoding = ?, blob_segment = ?, blob_offset = ?, blob_length = ?
+        WHERE paper_id = ?
+        """, updates)
+        conn.commit()
+        
+        count += len(rows)
+        last_id = rows[-1][0]
+        logger.info(f"Rewrote {count} full texts")
+    
+    return count, bytes_before, bytes_after
+
+if __name__ == "__main__":
+    import db
+    
+    parser = argparse.ArgumentParser(description="Manage compressed full text storage.")
+    parser.add_argument('--train-dictionary', action='store_true',
+                        help="train a compression dictionary on the stored full texts")
+    parser.add_argument('--compress', action='store_true',
+                        help="rewrite stored full texts with the configured compression and storage")
+    parser.add_argument('--vacuum', action='store_true', help="reclaim the space freed in the database")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=config.LOG_LEVEL, format=config.LOG_FORMAT)
+    if not (args.train_dictionary or args.compress or args.vacuum):
+        parser.print_help()
+    
+    with db.connection(DB_PATH) as conn:
+        if args.train_dictionary:
+            dictionary_id = train_and_store_dictionary(conn)
+            conn.commit()
+            print(f"Stored compression dictionary {dictionary_id}")
+        if args.compress:
+            count, before, after = reencode_stored_texts(conn)
+            print(f"Rewrote {count} full texts: {before / 1024 ** 2:.1f} MB -> {after / 1024 ** 2:.1f} MB")
+        if args.vacuum:
+            conn.execute("VACUUM")
+            print(f"Database is now {os.path.getsize(DB_PATH) / 1024 ** 2:.1f} MB")
@@ -4,7 +4,9 @@ import logging
 import nltk
 from datetime import datetime, timedelta
 import arxiv_retrieval
+import db
 import paper_processor
+import related_papers
 
 # Set up logging
 logging.basicConfig(
@@ -43,40 +45,6 @@ def download_nltk_resources():
         logger.info("Downloading NLTK stopwords")
         nltk.download('stopwords')
 
-def process_all_papers():
-    """Process all papers regardless of whether they have summaries or not."""
-    conn = arxiv_retrieval.sqlite3.connect(arxiv_retrieval.DB_PATH)
-    cursor = conn.cursor()
-    
-    try:
-        # Get all papers
-        cursor.execute("SELECT id FROM papers")
-        all_papers = cursor.fetchall()
-        
-        if not all_papers:
-            logger.info("No papers found in database")
-            return 0
-        
-        logger.info(f"Found {len(all_papers)} papers to process")
-        
-        # Process each paper
-        processed_count = 0
-        for paper in all_papers:
-            paper_id = paper[0]
-            success = paper_processor.extract_and_summarize_paper(paper_id)
-            if success:
-                processed_count += 1
-        
-        logger.info(f"Successfully processed {processed_count} papers")
-        return processed_count
-        
-    except Exception as e:
-        logger.error(f"Error processing papers: {str(e)}")
-        return 0
-        
-    finally:
-        conn.close()
-
 def main():
     logger.info("Starting worker process")
     
@@ -89,23 +57,26 @@ def main():
         logger.info("Initializing database...")
         arxiv_retrieval.create_database()
         logger.info("Database initialized")
+    else:
+        arxiv_retrieval.migrate_database()
     
     # Run initial retrieval if database is empty
-    conn = arxiv_retrieval.sqlite3.connect(arxiv_retrieval.DB_PATH)
+    conn = db.acquire(arxiv_retrieval.DB_PATH)
     try:
         paper_count = conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
         if paper_count == 0:
             logger.info("No papers in database. Running initial retrieval...")
-            arxiv_retrieval.retrieve_recent_papers(max_results=20)
+            arxiv_retrieval.retrieve_new_papers()
             paper_processor.process_unprocessed_papers()
     except Exception as e:
         logger.error(f"Error checking database: {str(e)}")
     finally:
-        conn.close()
+        db.release(conn)
     
-    # Process all existing papers to ensure summaries exist
-    logger.info("Processing all existing papers to ensure summaries exist")
-    process_all_papers()
+    # Bring existing papers up to date, redoing only what changed
+    logger.info("Processing papers with missing or outdated summaries")
+    paper_processor.process_stale_papers()
+    related_papers.update_related_papers()
     
     # Main loop
     while True:
@@ -113,7 +84,7 @@ def main():
             # Check if we should run paper retrieval
             if should_run_retrieval():
                 logger.info("Running scheduled paper retrieval...")
-                new_papers = arxiv_retrieval.retrieve_recent_papers(max_results=20)
+                new_papers = arxiv_retrieval.retrieve_new_papers()
                 logger.info(f"Retrieved {new_papers} new papers")
                 
                 # Process papers immediately after retrieval
@@ -128,6 +99,9 @@ def main():
             unprocessed = paper_processor.process_unprocessed_papers()
             if unprocessed > 0:
                 logger.info(f"Processed {unprocessed} previously missed papers")
+            
+            # Link new and re-summarized papers to related work
+            related_papers.update_related_papers()
                 
         except Exception as e:
             logger.error(f"Error in worker loop: {str(e)}")